@@ -0,0 +1,31 @@
+"""
+Gunicorn settings (`gunicorn -c gunicorn.conf.py`).
+
+SERVER_MODE=asgi serves hair_project.asgi through uvicorn workers, so each
+process interleaves many slow clients on the async views; the default
+'wsgi' keeps the classic sync workers. Both modes are supported, CSV
+exports included: they stream with an async iterator on ASGI
+(hair_app.exports.aexport_lines).
+"""
+import os
+
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "hair_project.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "hair_project.wsgi:application"
+    worker_class = "sync"
+
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+if workers > 1 and os.environ.get("CACHE_BACKEND") == "locmem":
+    # Each worker would keep its own cache versions and stats counters, serving
+    # pages other workers have already invalidated (see hair_app.caching)
+    raise RuntimeError("CACHE_BACKEND=locmem needs WEB_CONCURRENCY=1; use the shared 'file' cache")
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+# Restart workers now and then to bound memory growth
+max_requests = 1000
+max_requests_jitter = 100
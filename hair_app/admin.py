@@ -1,13 +1,123 @@
-from django.contrib import admin
-from .models import HairDonor, HairRequest, DonationMatch, ContactMessage, UserProfile
+import io
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from . import allocation
+from .forms import ImportFileForm
+from .importer import guess_format, import_rows, read_rows
+from .models import (HairDonor, HairRequest, DonationMatch, ContactMessage, UserProfile, Job, Notification,
+                     PincodeCentroid)
+from .pagination import ApproximateCountPaginator
+from .thumbnails import get_thumbnail
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow to hundreds of thousands of rows"""
+    paginator = ApproximateCountPaginator
+    # Skip the second, unfiltered COUNT(*) on filtered changelists
+    show_full_result_count = False
+
+
+class CommonValuesListFilter(admin.SimpleListFilter):
+    """
+    Filter on a free-text column (named by parameter_name) offering only its
+    most common values. Django's default filter for such a column runs SELECT
+    DISTINCT over the whole table on every changelist view; this groups it
+    once per ADMIN_FILTER_CACHE_SECONDS.
+    """
+    max_values = 50
+
+    def lookups(self, request, model_admin):
+        opts = model_admin.model._meta
+        key = f'admin-filter:{opts.label_lower}:{self.parameter_name}'
+        values = cache.get(key)
+        if values is None:
+            rows = (
+                model_admin.model.objects.exclude(**{self.parameter_name: ''}).order_by()
+                .values(self.parameter_name).annotate(rows=Count('pk')).order_by('-rows')[:self.max_values]
+            )
+            values = sorted(row[self.parameter_name] for row in rows)
+            cache.set(key, values, getattr(settings, 'ADMIN_FILTER_CACHE_SECONDS', 3600))
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class CityListFilter(CommonValuesListFilter):
+    title = 'city'
+    parameter_name = 'city'
+
+
+class StateListFilter(CommonValuesListFilter):
+    title = 'state'
+    parameter_name = 'state'
+
+
+class ImportRecordsMixin:
+    """Adds an "Import" page to the changelist that runs hair_app.importer"""
+    import_kind = None
+    change_list_template = 'admin/hair_app/change_list_import.html'
+    # Rejected rows listed after an import
+    max_reported_errors = 20
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='%s_%s_import' % info),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = ImportFileForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            errors = []
+
+            def on_error(row_number, message):
+                if len(errors) < self.max_reported_errors:
+                    errors.append(f'Row {row_number}: {message}')
+
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            result = import_rows(self.import_kind, read_rows(stream, guess_format(upload.name)), on_error=on_error)
+            self.message_user(request, f'Imported {result.created} row(s), rejected {result.failed}.',
+                              messages.SUCCESS if not result.failed else messages.WARNING)
+            for error in errors:
+                self.message_user(request, error, messages.ERROR)
+
+            opts = self.model._meta
+            return redirect(reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist'))
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': f'Import {self.model._meta.verbose_name_plural}',
+        }
+        return TemplateResponse(request, 'admin/hair_app/import_form.html', context)
+
 
 @admin.register(HairDonor)
-class HairDonorAdmin(admin.ModelAdmin):
+class HairDonorAdmin(ImportRecordsMixin, LargeTableAdmin):
+    import_kind = 'donors'
     list_display = ['full_name', 'phone', 'city', 'hair_length', 'hair_color', 'status', 'created_at']
-    list_filter = ['status', 'gender', 'hair_type', 'hair_color', 'city', 'state']
+    list_filter = ['status', 'gender', 'hair_type', 'hair_color', CityListFilter, StateListFilter]
     search_fields = ['full_name', 'email', 'phone', 'city']
     list_editable = ['status']
     date_hierarchy = 'created_at'
+    raw_id_fields = ['user']
     
     fieldsets = (
         ('Personal Information', {
@@ -26,12 +136,18 @@ class HairDonorAdmin(admin.ModelAdmin):
 
 
 @admin.register(HairRequest)
-class HairRequestAdmin(admin.ModelAdmin):
-    list_display = ['patient_name', 'patient_type', 'urgency', 'city', 'request_status', 'created_at']
-    list_filter = ['request_status', 'patient_type', 'urgency', 'city', 'state']
+class HairRequestAdmin(ImportRecordsMixin, LargeTableAdmin):
+    import_kind = 'requests'
+    list_display = ['patient_name', 'patient_type', 'urgency_level', 'city', 'request_status', 'created_at']
+    list_filter = ['request_status', 'patient_type', 'urgency', 'certificate_status', CityListFilter,
+                   StateListFilter]
     search_fields = ['patient_name', 'email', 'phone', 'hospital_name']
     list_editable = ['request_status']
     date_hierarchy = 'created_at'
+    raw_id_fields = ['user']
+    autocomplete_fields = ['matched_donor']
+    readonly_fields = ['certificate_status', 'certificate_preview']
+    actions = ['allocate_donors']
     
     fieldsets = (
         ('Patient Information', {
@@ -41,7 +157,8 @@ class HairRequestAdmin(admin.ModelAdmin):
             'fields': ('address', 'city', 'state', 'pincode')
         }),
         ('Medical Details', {
-            'fields': ('patient_type', 'medical_condition', 'urgency', 'medical_certificate')
+            'fields': ('patient_type', 'medical_condition', 'urgency', 'medical_certificate', 'certificate_status',
+                       'certificate_preview')
         }),
         ('Hair Requirements', {
             'fields': ('required_hair_length', 'preferred_hair_color', 'preferred_hair_type')
@@ -53,18 +170,39 @@ class HairRequestAdmin(admin.ModelAdmin):
             'fields': ('request_status', 'matched_donor', 'admin_notes')
         }),
     )
+    
+    @admin.action(description='Allocate donors to selected requests')
+    def allocate_donors(self, request, queryset):
+        result = allocation.allocate(request_ids=list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f'Allocated {len(result.pairs)} of {result.requests} open request(s).')
+    
+    @admin.display(description='Urgency', ordering='urgency_priority')
+    def urgency_level(self, obj):
+        return obj.urgency
+    
+    @admin.display(description='Preview')
+    def certificate_preview(self, obj):
+        # A thumbnail rather than the full scan; PDFs have none
+        url = get_thumbnail(obj.medical_certificate, 'admin')
+        if not url:
+            return '-'
+        return format_html('<a href="{}"><img src="{}" alt="Certificate preview"></a>',
+                           obj.medical_certificate.url, url)
 
 
 @admin.register(DonationMatch)
-class DonationMatchAdmin(admin.ModelAdmin):
-    list_display = ['donor', 'request', 'matched_date', 'donation_completed', 'completion_date']
-    list_filter = ['donation_completed', 'matched_date']
+class DonationMatchAdmin(LargeTableAdmin):
+    list_display = ['donor', 'request', 'matched_date', 'score', 'is_proposal', 'donation_completed', 'completion_date']
+    list_filter = ['is_proposal', 'donation_completed', 'matched_date']
+    list_select_related = ['donor', 'request']
     search_fields = ['donor__full_name', 'request__patient_name']
     date_hierarchy = 'matched_date'
+    autocomplete_fields = ['donor', 'request']
+    readonly_fields = ['matched_date']
     
     fieldsets = (
         ('Match Details', {
-            'fields': ('donor', 'request', 'matched_date')
+            'fields': ('donor', 'request', 'matched_date', 'score', 'is_proposal')
         }),
         ('Completion Status', {
             'fields': ('donation_completed', 'completion_date', 'feedback', 'rating')
@@ -79,4 +217,35 @@ class ContactMessageAdmin(admin.ModelAdmin):
     search_fields = ['name', 'email', 'subject', 'message']
     list_editable = ['is_read']
     date_hierarchy = 'created_at'
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ['task', 'status', 'attempts', 'run_at', 'locked_by', 'updated_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'unique_key']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['task', 'args', 'unique_key', 'attempts', 'locked_by', 'locked_at', 'last_error',
+                       'created_at', 'updated_at']
+    actions = ['retry_jobs']
+    
+    @admin.action(description='Retry selected jobs now')
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status='Running').update(status='Queued', attempts=0, run_at=timezone.now())
+        self.message_user(request, f'{count} job(s) queued again.')
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ['recipient', 'kind', 'subject', 'created_at', 'sent_at', 'attempts']
+    list_filter = ['kind', ('sent_at', admin.EmptyFieldListFilter)]
+    search_fields = ['recipient', 'subject']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['created_at', 'sent_at', 'attempts', 'last_error']
+
+
+@admin.register(PincodeCentroid)
+class PincodeCentroidAdmin(LargeTableAdmin):
+    list_display = ['pincode', 'latitude', 'longitude']
+    search_fields = ['pincode']
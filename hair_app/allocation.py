@@ -0,0 +1,359 @@
+"""
+Batch allocation of donors to open requests.
+
+Picking matched_donor one request at a time lets several urgent requests
+compete for the same donor. allocate() instead solves the assignment
+problem over all open requests at once: it maximises the total
+matching.score_pair() (which already weighs urgency, length surplus, hair
+preferences and distance) with each donor used at most once.
+
+Solving a dense 10k x 10k problem is out of reach in Python, so each
+request is first pruned to its ALLOCATION_CANDIDATES_PER_REQUEST best donors
+within ALLOCATION_MAX_DISTANCE_KM. Donors are bucketed by everything the
+score depends on except hair length, so within a bucket the score only
+falls as the length surplus grows; the best candidates are a heap merge
+over the nearby buckets, each entered at its shortest sufficient length.
+Distances and preference scores are worked out once per centroid and
+bucket, and score_pair() only for the candidates kept.
+The sparse problem is then solved exactly by shortest augmenting paths
+(Dijkstra on reduced costs, as in the Jonker-Volgenant method). Every
+request also has a zero-weight "stay unassigned" option, so a request is
+only matched when that raises the total.
+"""
+import heapq
+import math
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, changes, geo, notifications, search, stats
+from .matching import (
+    COLOR_WEIGHT, DONOR_FIELDS, LOCATION_WEIGHT, REQUEST_FIELDS, TYPE_WEIGHT, available_donors, length_score,
+    location_score, open_requests, preference_score, score_pair, urgency_factor,
+)
+from .models import DonationMatch, HairDonor, HairRequest
+
+# Scores are compared as integers so the solver is exact
+SCORE_SCALE = 1000
+
+# Status given to a donor once allocated, so later runs skip them
+ALLOCATED_DONOR_STATUS = 'Pending'
+
+Allocation = namedtuple('Allocation', ['pairs', 'total_score', 'requests', 'donors', 'edges'])
+
+
+def candidates_per_request():
+    return getattr(settings, 'ALLOCATION_CANDIDATES_PER_REQUEST', 10)
+
+
+def max_distance_km():
+    return getattr(settings, 'ALLOCATION_MAX_DISTANCE_KM', 150)
+
+
+def _text_key(value):
+    return (value or '').strip().lower()
+
+
+class _Bucket:
+    """Donors sharing every scored attribute but hair length, shortest hair first"""
+
+    def __init__(self, donors, same_pincode=False):
+        self.donors = sorted(donors, key=lambda donor: (donor.hair_length, -donor.id))
+        self.lengths = [donor.hair_length for donor in self.donors]
+        # Stands in for the whole bucket when scoring location and preferences
+        self.sample = self.donors[0] if same_pincode else self.donors[0]._replace(pincode='')
+
+
+class _Place:
+    """The buckets of donors located at one centroid"""
+
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.buckets = []
+
+
+class CandidateIndex:
+    """
+    Nearby-donor lookup for candidate pruning. Location buckets ignore the
+    pincode, so a donor in the request's own pincode is also found, with its
+    higher score, through the per-pincode buckets.
+    """
+
+    def __init__(self, donors):
+        groups = defaultdict(list)
+        self.size = 0
+        for donor in donors:
+            groups[(donor.latitude, donor.longitude, _text_key(donor.city), _text_key(donor.state),
+                    donor.hair_color, donor.hair_type, donor.pincode)].append(donor)
+            self.size += 1
+
+        places = {}
+        by_location = defaultdict(list)
+        self.by_pincode = defaultdict(list)
+        self.by_state = defaultdict(list)
+        self.unlocated_by_state = defaultdict(list)
+        self.places_by_cell = defaultdict(list)
+        for key, members in groups.items():
+            if key[6]:
+                self.by_pincode[key[6]].append(_Bucket(members, same_pincode=True))
+            by_location[key[:6]].extend(members)
+        for key, members in by_location.items():
+            bucket = _Bucket(members)
+            latitude, longitude, _, state = key[:4]
+            self.by_state[state].append(bucket)
+            if latitude is None:
+                self.unlocated_by_state[state].append(bucket)
+                continue
+            place = places.get((latitude, longitude))
+            if place is None:
+                place = places[latitude, longitude] = _Place(latitude, longitude)
+                self.places_by_cell[geo.cell_for(latitude, longitude)].append(place)
+            place.buckets.append(bucket)
+
+    def _nearby(self, hair_request, max_distance):
+        """(bucket, location score) pairs for the donors close enough to a request"""
+        found = []
+        if hair_request.pincode:
+            found.extend(
+                (bucket, location_score(hair_request, bucket.sample))
+                for bucket in self.by_pincode.get(hair_request.pincode, ())
+            )
+        state = _text_key(hair_request.state)
+        if hair_request.latitude is None:
+            # Without coordinates only the text fallback of score_pair applies
+            found.extend((bucket, location_score(hair_request, bucket.sample)) for bucket in self.by_state.get(state, ()))
+            return found
+        found.extend(
+            (bucket, location_score(hair_request, bucket.sample))
+            for bucket in self.unlocated_by_state.get(state, ())
+        )
+        for cell in geo.cells_around(hair_request.latitude, hair_request.longitude, max_distance):
+            for place in self.places_by_cell.get(cell, ()):
+                distance = geo.distance_km(hair_request.latitude, hair_request.longitude,
+                                           place.latitude, place.longitude)
+                if distance <= max_distance:
+                    score = location_score(hair_request, place.buckets[0].sample)
+                    found.extend((bucket, score) for bucket in place.buckets)
+        return found
+
+    def candidates(self, hair_request, limit, max_distance):
+        """Best `limit` (score, donor_id) pairs among nearby donors with long enough hair"""
+        required = hair_request.required_hair_length
+        urgency = urgency_factor(hair_request)
+        preferences = {}
+
+        def fixed_part(bucket, location):
+            # score_pair minus its length term, shared by the whole bucket
+            donor = bucket.sample
+            key = (donor.hair_color, donor.hair_type)
+            if key not in preferences:
+                preferences[key] = (
+                    COLOR_WEIGHT * preference_score(hair_request.preferred_hair_color, donor.hair_color)
+                    + TYPE_WEIGHT * preference_score(hair_request.preferred_hair_type, donor.hair_type)
+                )
+            return preferences[key] + urgency * LOCATION_WEIGHT * location
+
+        heap = []
+        for number, (bucket, location) in enumerate(self._nearby(hair_request, max_distance)):
+            position = bisect_left(bucket.lengths, required)
+            if position < len(bucket.donors):
+                fixed = fixed_part(bucket, location)
+                donor = bucket.donors[position]
+                key = fixed + urgency * length_score(donor.hair_length - required)
+                heapq.heappush(heap, (-key, -donor.id, number, position, fixed, bucket))
+        found = []
+        seen = set()
+        while heap and len(found) < limit:
+            _, donor_id, number, position, fixed, bucket = heapq.heappop(heap)
+            donor = bucket.donors[position]
+            if donor.id not in seen:
+                # Same-pincode donors come out of their own bucket first
+                seen.add(donor.id)
+                found.append((score_pair(hair_request, donor), donor.id))
+            position += 1
+            if position < len(bucket.donors):
+                donor = bucket.donors[position]
+                key = fixed + urgency * length_score(donor.hair_length - required)
+                heapq.heappush(heap, (-key, -donor.id, number, position, fixed, bucket))
+        return found
+
+
+def solve(edges):
+    """
+    Maximum-weight assignment on a sparse bipartite graph.
+
+    `edges[i]` lists (column, weight) pairs of row i with integer weights and
+    non-negative column ids. Rows may stay unassigned. Returns {row: column}
+    for the assigned rows.
+    """
+    # Minimise cost = -weight. Row i also owns a private dummy column ~i
+    # ("unassigned") of cost 0, so every row can always be assigned.
+    costs = [[(column, -weight) for column, weight in row] + [(~i, 0)] for i, row in enumerate(edges)]
+    price = defaultdict(int)  # column duals; reduced costs stay >= 0 and are 0 on assigned edges
+    column_of = {}
+    row_of = {}
+    assigned_cost = {}
+
+    for root, root_edges in enumerate(costs):
+        dist = {}
+        pred = {}
+        heap = []
+        for column, cost in root_edges:
+            d = cost - price[column]
+            if d < dist.get(column, math.inf):
+                dist[column] = d
+                pred[column] = (root, cost)
+                heapq.heappush(heap, (d, column))
+
+        # Dijkstra until the nearest free column
+        scanned = []
+        finished = set()
+        while True:
+            d, column = heapq.heappop(heap)
+            if column in finished or d > dist[column]:
+                continue
+            if column not in row_of:
+                break
+            finished.add(column)
+            scanned.append(column)
+            row = row_of[column]
+            row_dual = assigned_cost[row] - price[column]
+            for next_column, cost in costs[row]:
+                nd = d + cost - row_dual - price[next_column]
+                if nd < dist.get(next_column, math.inf):
+                    dist[next_column] = nd
+                    pred[next_column] = (row, cost)
+                    heapq.heappush(heap, (nd, next_column))
+
+        for done in scanned:
+            price[done] += dist[done] - d
+
+        # Flip the assignments along the path back to the root
+        while True:
+            row, cost = pred[column]
+            previous = column_of.get(row)
+            column_of[row] = column
+            row_of[column] = row
+            assigned_cost[row] = cost
+            if row == root:
+                break
+            column = previous
+
+    return {row: column for row, column in column_of.items() if column >= 0}
+
+
+def _chunks(items, size=500):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def plan(request_ids=None, limit=None, max_distance=None):
+    """
+    Compute an optimal allocation without saving it. `request_ids` restricts
+    it to some open requests; all available donors are considered.
+    """
+    limit = limit or candidates_per_request()
+    max_distance = max_distance or max_distance_km()
+    hair_requests = open_requests().filter(matched_donor__isnull=True)
+    if request_ids is not None:
+        hair_requests = hair_requests.filter(id__in=list(request_ids))
+    hair_requests = list(hair_requests.values_list(*REQUEST_FIELDS, named=True))
+    donors = available_donors().values_list(*DONOR_FIELDS, named=True)
+    index = CandidateIndex(donors.iterator(chunk_size=2000))
+
+    edges = []
+    for hair_request in hair_requests:
+        edges.append([
+            (donor_id, round(score * SCORE_SCALE))
+            for score, donor_id in index.candidates(hair_request, limit, max_distance)
+        ])
+    weights = [dict(row) for row in edges]
+
+    pairs = [
+        (hair_requests[row].id, column, weights[row][column] / SCORE_SCALE)
+        for row, column in sorted(solve(edges).items())
+    ]
+    return Allocation(
+        pairs=pairs,
+        total_score=round(sum(score for _, _, score in pairs), 4),
+        requests=len(hair_requests),
+        donors=index.size,
+        edges=sum(len(row) for row in edges),
+    )
+
+
+def _still_free(pairs):
+    """The pairs whose request is still unallocated and donor still available, locking both"""
+    request_ids = set()
+    donor_ids = set()
+    for chunk in _chunks(pairs):
+        request_ids.update(
+            open_requests().filter(id__in=[pair[0] for pair in chunk], matched_donor__isnull=True)
+            .select_for_update().values_list('id', flat=True)
+        )
+        donor_ids.update(
+            available_donors().filter(id__in=[pair[1] for pair in chunk])
+            .select_for_update().values_list('id', flat=True)
+        )
+    return [pair for pair in pairs if pair[0] in request_ids and pair[1] in donor_ids]
+
+
+def save(allocation):
+    """
+    Create the confirmed DonationMatch rows, set matched_donor and mark the
+    requests Matched and the donors Pending, all in one transaction. Pairs
+    that changed since planning are skipped. Returns the pairs saved.
+    """
+    with transaction.atomic():
+        pairs = _still_free(allocation.pairs)
+        if not pairs:
+            return []
+        request_ids = [pair[0] for pair in pairs]
+        donor_ids = [pair[1] for pair in pairs]
+        hair_requests = HairRequest.objects.in_bulk(request_ids)
+        # Bulk writes skip auto_now; the reports refresh reads updated_at
+        now = timezone.now()
+        donors = HairDonor.objects.in_bulk(donor_ids)
+
+        matches = DonationMatch.objects.bulk_create([
+            DonationMatch(donor_id=donor_id, request_id=request_id, score=score)
+            for request_id, donor_id, score in pairs
+        ], batch_size=500)
+        for request_id, donor_id, _ in pairs:
+            hair_request = hair_requests[request_id]
+            hair_request.matched_donor_id = donor_id
+            hair_request.request_status = 'Matched'
+            hair_request.updated_at = now
+        HairRequest.objects.bulk_update(hair_requests.values(), ['matched_donor', 'request_status', 'updated_at'],
+                                        batch_size=500)
+        for chunk in _chunks(donor_ids):
+            HairDonor.objects.filter(id__in=chunk).update(status=ALLOCATED_DONOR_STATUS, updated_at=now)
+        for donor in donors.values():
+            donor.status = ALLOCATED_DONOR_STATUS
+
+        # Bulk writes skip the model signals; do what they would have done
+        search.index_objects('donor', donors.values())
+        search.index_objects('request', hair_requests.values())
+        changes.mark('request', request_ids)
+        changes.mark('donor', donor_ids)
+        for match in matches:
+            match.request = hair_requests[match.request_id]
+            match.donor = donors[match.donor_id]
+        notifications.matches_created(matches)
+        stats.invalidate()
+        caching.bump('donors', 'requests', 'matches')
+    return pairs
+
+
+def allocate(request_ids=None, limit=None, max_distance=None, dry_run=False):
+    """plan() and, unless `dry_run`, save() an allocation; returns the Allocation saved"""
+    allocation = plan(request_ids, limit, max_distance)
+    if dry_run:
+        return allocation
+    pairs = save(allocation)
+    return allocation._replace(pairs=pairs, total_score=round(sum(score for _, _, score in pairs), 4))
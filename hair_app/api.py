@@ -0,0 +1,142 @@
+"""
+Versioned JSON API (mounted at /api/v1/).
+
+Lists use cursor pagination and accept `?fields=` to return, and load,
+only the named columns. Every GET carries an ETag, so clients polling
+with If-None-Match get an empty 304 when nothing changed. A record's
+ETag and Last-Modified come from its `updated_at`; a list's ETag comes
+from the cache version counters (hair_app.caching) that writes bump, so
+answering a list poll runs no query.
+"""
+import hashlib
+
+from django.urls import include, path
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import pagination, permissions, routers, viewsets
+from rest_framework.response import Response
+
+from . import caching
+from .filters import filter_donors, filter_requests
+from .models import HairDonor, HairRequest, DonationMatch
+from .serializers import DonationMatchSerializer, HairDonorSerializer, HairRequestSerializer
+
+
+class CreatedCursorPagination(pagination.CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class MatchCursorPagination(CreatedCursorPagination):
+    ordering = ('-matched_date', '-id')
+
+
+class IsOwnerOrStaffOrReadOnly(permissions.BasePermission):
+    """Anyone may read; only the record's owner or staff may change it"""
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return request.user.is_staff or (obj.user_id is not None and obj.user_id == request.user.id)
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified handling for list and detail GETs"""
+
+    # caching namespaces bumped by every write that can change a list
+    cache_namespaces = ()
+
+    def _validators(self, request, last_modified, extra):
+        key = '|'.join([
+            str(request.version), request.get_full_path(), str(last_modified), str(extra),
+        ])
+        return hashlib.md5(key.encode()).hexdigest(), last_modified
+
+    def _conditional(self, request, etag, last_modified, respond):
+        timestamp = last_modified.timestamp() if last_modified else None
+        not_modified = get_conditional_response(request, etag=quote_etag(etag), last_modified=timestamp)
+        if not_modified is not None:
+            return not_modified
+        response = respond()
+        response['ETag'] = quote_etag(etag)
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        versions = '.'.join(str(caching.version(name)) for name in self.cache_namespaces)
+        etag, last_modified = self._validators(request, None, versions)
+        return self._conditional(request, etag, last_modified,
+                                 lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self._validators(request, instance.updated_at, instance.pk)
+        return self._conditional(request, etag, last_modified,
+                                 lambda: Response(self.get_serializer(instance).data))
+
+
+class SparseViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    pagination_class = CreatedCursorPagination
+
+    def base_queryset(self):
+        raise NotImplementedError
+
+    def get_queryset(self):
+        queryset = self.base_queryset()
+        if self.request.method == 'GET':
+            columns = self.get_serializer_class().model_columns(self.request)
+            # The cursor reads its ordering fields from every row
+            columns.update(field.lstrip('-') for field in self.pagination_class.ordering)
+            queryset = queryset.only(*columns)
+        return queryset
+
+
+class HairDonorViewSet(SparseViewSet):
+    serializer_class = HairDonorSerializer
+    cache_namespaces = ('donors',)
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrStaffOrReadOnly]
+
+    def base_queryset(self):
+        donors = filter_donors(HairDonor.objects.all(), self.request.query_params)
+        status = self.request.query_params.get('status')
+        return donors.filter(status=status) if status else donors
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class HairRequestViewSet(SparseViewSet):
+    serializer_class = HairRequestSerializer
+    cache_namespaces = ('requests',)
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrStaffOrReadOnly]
+
+    def base_queryset(self):
+        requests = filter_requests(HairRequest.objects.all(), self.request.query_params)
+        request_status = self.request.query_params.get('request_status')
+        return requests.filter(request_status=request_status) if request_status else requests
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class DonationMatchViewSet(SparseViewSet):
+    serializer_class = DonationMatchSerializer
+    cache_namespaces = ('matches',)
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = MatchCursorPagination
+
+    def base_queryset(self):
+        return DonationMatch.objects.filter(is_proposal=False)
+
+
+router = routers.DefaultRouter()
+router.register('donors', HairDonorViewSet, basename='api-donor')
+router.register('requests', HairRequestViewSet, basename='api-request')
+router.register('matches', DonationMatchViewSet, basename='api-match')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
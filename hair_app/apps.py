@@ -6,4 +6,5 @@ class HairAppConfig(AppConfig):
     name = 'hair_app'
     
     def ready(self):
-        import hair_app.signals
\ No newline at end of file
+        import hair_app.signals
+        import hair_app.tasks
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""
+Benchmark harness for the hair_app pages.
+
+Every URL in hair_app/urls.py is requested through the test client, as an
+anonymous visitor and, for pages that need it, as a logged-in staff member
+who owns some of the data. For each page it records latency percentiles and
+the number of SQL queries. hasher_cost() and login_cost() measure the CPU
+cost of a password hash and the latency of a login. Results are plain
+dicts that can be saved as a JSON baseline and compared later: query
+counts are deterministic and any increase is a regression, while
+latencies only count beyond a tolerance.
+"""
+import json
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .models import HairDonor, HairRequest
+
+# Pages and how to reach them: (url name, args, logged in, query string)
+Target = namedtuple('Target', ['name', 'args', 'login', 'query'])
+
+# Not benchmarked: logout would end the session the other pages use
+SKIPPED = {'logout'}
+
+# Pages only a logged-in user (or staff member) can see
+LOGIN_REQUIRED = {
+    'my_donations', 'my_requests', 'user_profile', 'edit_profile', 'change_password', 'delete_account',
+    'export_records', 'metrics_summary', 'metrics_prometheus', 'reports_dashboard',
+}
+
+# Extra query strings so filtered and searched paths are measured too
+QUERIES = {
+    'donor_list': {'city': 'Mumbai', 'min_length': '12'},
+    'request_list': {'urgency': 'High'},
+    'search': {'q': 'mumbai'},
+}
+
+# Run with a dummy default cache so every hit measures a full render;
+# sessions stay cached as in production
+NO_CACHE = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+
+def targets():
+    """One Target per URL in hair_app.urls"""
+    from . import urls
+
+    hair_request = HairRequest.objects.order_by('id').first()
+    found = []
+    for pattern in urls.urlpatterns:
+        name = pattern.name
+        if name in SKIPPED:
+            continue
+        args = []
+        if name == 'request_detail':
+            if hair_request is None:
+                continue
+            args = [hair_request.pk]
+        elif name == 'export_records':
+            args = ['donors']
+        found.append(Target(name, args, name in LOGIN_REQUIRED, QUERIES.get(name, {})))
+    return found
+
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+def benchmark_user():
+    """A staff user that owns some donors and requests, for the personal pages"""
+    user, created = User.objects.get_or_create(username='benchmark', defaults={'is_staff': True})
+    if created:
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save()
+        HairDonor.objects.filter(pk__in=HairDonor.objects.order_by('id').values('pk')[:20]).update(user=user)
+        HairRequest.objects.filter(pk__in=HairRequest.objects.order_by('id').values('pk')[:20]).update(user=user)
+    return user
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def measure(client, url, query, iterations, warmup, method='get'):
+    """{'p50_ms', 'p90_ms', 'p99_ms', 'queries', 'status'} for one URL"""
+    send = getattr(client, method)
+    for _ in range(warmup):
+        send(url, query)
+    timings = []
+    queries = []
+    status = None
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = send(url, query)
+            if response.streaming:
+                # Exports only do their work while being consumed
+                b''.join(response.streaming_content)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured.captured_queries))
+        status = response.status_code
+    return {
+        'status': status,
+        'queries': max(queries),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p90_ms': round(percentile(timings, 0.9), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+    }
+
+
+def run(iterations=20, warmup=2, use_cache=False, names=None):
+    """Benchmark every target and return {url name: measurements}"""
+    anonymous = Client()
+    member = Client()
+    member.force_login(benchmark_user())
+
+    results = {}
+    with override_settings(**({} if use_cache else {'CACHES': {**settings.CACHES, 'default': NO_CACHE}})):
+        for target in targets():
+            if names and target.name not in names:
+                continue
+            url = reverse(target.name, args=target.args)
+            client = member if target.login else anonymous
+            results[target.name] = measure(client, url, target.query, iterations, warmup)
+    return results
+
+
+def hasher_cost(path, iterations=10):
+    """
+    {'algorithm', 'hash_ms', 'cpu_ms'} of checking one password with the
+    hasher at `path`; raises ValueError if its library is not installed.
+    """
+    hasher = import_string(path)()
+    encoded = hasher.encode(BENCHMARK_PASSWORD, hasher.salt())
+    start, cpu_start = time.perf_counter(), time.process_time()
+    for _ in range(iterations):
+        hasher.verify(BENCHMARK_PASSWORD, encoded)
+    return {
+        'algorithm': hasher.algorithm,
+        'hash_ms': round((time.perf_counter() - start) * 1000 / iterations, 2),
+        'cpu_ms': round((time.process_time() - cpu_start) * 1000 / iterations, 2),
+    }
+
+
+def login_cost(path, iterations=10, warmup=1):
+    """measure() of a successful POST to the login view with passwords hashed by `path`"""
+    user = benchmark_user()
+    with override_settings(PASSWORD_HASHERS=[path]):
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save(update_fields=['password'])
+        return measure(Client(), reverse('login'), {'username': user.username, 'password': BENCHMARK_PASSWORD},
+                       iterations, warmup, method='post')
+
+
+def compare(baseline, current, tolerance=0.25, min_ms=5.0):
+    """
+    Regressions of `current` against `baseline`, both {scale: {url name: measurements}}.
+    A p90 only counts when it grew by more than `tolerance` and by at least
+    `min_ms`, so jitter on millisecond pages is ignored. Returns a list of
+    human-readable lines; empty when nothing got worse.
+    """
+    problems = []
+    for scale, pages in current.items():
+        for name, now in pages.items():
+            before = baseline.get(scale, {}).get(name)
+            if before is None:
+                continue
+            if now['status'] != before['status']:
+                problems.append(f'{scale} {name}: status {before["status"]} -> {now["status"]}')
+            if now['queries'] > before['queries']:
+                problems.append(f'{scale} {name}: queries {before["queries"]} -> {now["queries"]}')
+            slower = now['p90_ms'] - before['p90_ms']
+            if slower >= min_ms and now['p90_ms'] > before['p90_ms'] * (1 + tolerance):
+                problems.append(f'{scale} {name}: p90 {before["p90_ms"]}ms -> {now["p90_ms"]}ms')
+    return problems
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save(path, results):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write('\n')
@@ -0,0 +1,130 @@
+"""
+Versioned page and fragment caching for the public pages.
+
+Every cached page and template fragment includes the current version of
+the data it shows ('donors', 'requests', 'matches'). Model signals bump a
+version once the saving transaction commits, which orphans every entry
+built from the old data instead of tracking and deleting them one by one.
+Whole responses are only cached for anonymous visitors, since logged-in
+users see their own navigation and messages.
+"""
+import asyncio
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import urlencode
+
+VERSION_PREFIX = 'cachever:'
+PAGE_PREFIX = 'page:'
+
+NAMESPACES = ('donors', 'requests', 'matches')
+
+
+def _new_version():
+    # Never reuse a number an evicted counter had, or old entries would revive
+    return time.time_ns()
+
+
+def version(name):
+    """Current version of a namespace"""
+    key = VERSION_PREFIX + name
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _new_version(), None)
+        value = cache.get(key)
+    return value
+
+
+def _bump(name):
+    try:
+        cache.incr(VERSION_PREFIX + name)
+    except ValueError:
+        cache.set(VERSION_PREFIX + name, _new_version(), None)
+
+
+def bump(*names):
+    """Invalidate everything cached from these namespaces once the transaction commits"""
+    for name in names:
+        transaction.on_commit(lambda name=name: _bump(name))
+
+
+class Versions:
+    """Lazy namespace versions for templates: {% cache ... cache_versions.donors %}"""
+
+    def __getitem__(self, name):
+        if name not in NAMESPACES:
+            raise KeyError(name)
+        return version(name)
+
+
+def _page_key(request, namespaces):
+    versions = '.'.join(str(version(name)) for name in namespaces)
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'{PAGE_PREFIX}{versions}:{digest}'
+
+
+def _cacheable(request):
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # A pending flash message must be shown, and must not be cached for others
+    return not len(messages.get_messages(request))
+
+
+def _storable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def _page_timeout(timeout):
+    return timeout if timeout is not None else getattr(settings, 'PAGE_CACHE_SECONDS', 300)
+
+
+def cache_public_page(*namespaces, timeout=None):
+    """
+    Cache a view's response for anonymous visitors, keyed on the path, the
+    query string and the versions of `namespaces`. Works on sync and async views.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # Session and user loading are sync-only on Django 4.2
+                if not await sync_to_async(_cacheable)(request):
+                    return await view(request, *args, **kwargs)
+
+                key = await sync_to_async(_page_key)(request, namespaces)
+                cached = await cache.aget(key)
+                if cached is not None:
+                    content, content_type = cached
+                    return HttpResponse(content, content_type=content_type)
+
+                response = await view(request, *args, **kwargs)
+                if _storable(response):
+                    await cache.aset(key, (response.content, response['Content-Type']), _page_timeout(timeout))
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            key = _page_key(request, namespaces)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            response = view(request, *args, **kwargs)
+            if _storable(response):
+                cache.set(key, (response.content, response['Content-Type']), _page_timeout(timeout))
+            return response
+        return wrapper
+    return decorator
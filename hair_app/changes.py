@@ -0,0 +1,71 @@
+"""
+Change capture for the match proposals.
+
+Saving or deleting a donor or request in a way that can change its matches
+appends a MatchChange row once the transaction commits and queues a
+debounced `compute_matches` job in its changed-only mode. That job
+(matching.refresh_changed) rescores only the affected donor x request
+pairs, so keeping proposals fresh costs as much as the rate of change
+rather than the size of the tables.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import jobs
+from .models import DonationMatch, HairDonor, HairRequest, MatchChange
+
+# Fields that decide eligibility or feed matching.score_pair
+TRACKED_FIELDS = {
+    HairDonor: ['status', 'willing_to_donate', 'hair_length', 'hair_color', 'hair_type',
+                'pincode', 'city', 'state'],
+    HairRequest: ['request_status', 'required_hair_length', 'preferred_hair_color', 'preferred_hair_type',
+                  'urgency', 'pincode', 'city', 'state'],
+}
+
+KINDS = {HairDonor: 'donor', HairRequest: 'request'}
+
+
+def refresh_delay():
+    return getattr(settings, 'MATCH_REFRESH_DELAY_SECONDS', 10)
+
+
+def _write(kind, ids):
+    MatchChange.objects.bulk_create([MatchChange(kind=kind, object_id=pk) for pk in ids])
+    # A burst of changes within the delay is handled by one job
+    jobs.enqueue('compute_matches', True, delay=refresh_delay(), unique_key='refresh_matches')
+
+
+def mark(kind, ids):
+    """Record that the matches of these donors or requests are stale, once the transaction commits"""
+    ids = list(ids)
+    if ids:
+        transaction.on_commit(lambda: _write(kind, ids))
+
+
+def _snapshot(instance):
+    fields = TRACKED_FIELDS[type(instance)]
+    if any(field not in instance.__dict__ for field in fields):
+        # Deferred fields: unknown, so any save counts as a change
+        return None
+    return tuple(instance.__dict__[field] for field in fields)
+
+
+def remember_state(instance):
+    instance._match_state = _snapshot(instance)
+
+
+def record_save(instance, created):
+    previous = getattr(instance, '_match_state', None)
+    if created or previous is None or previous != _snapshot(instance):
+        mark(KINDS[type(instance)], [instance.pk])
+    remember_state(instance)
+
+
+def record_delete(instance):
+    """
+    Called before a delete. The proposals of a deleted donor go with it, so
+    the requests it was proposed for are marked to be refilled instead.
+    """
+    if isinstance(instance, HairDonor):
+        request_ids = DonationMatch.objects.filter(donor=instance, is_proposal=True).values_list('request_id', flat=True)
+        mark('request', list(request_ids))
@@ -0,0 +1,11 @@
+from django.conf import settings
+
+from .caching import Versions
+
+
+def fragment_cache(request):
+    """Timeout and data versions for {% cache %} fragments"""
+    return {
+        'fragment_cache_seconds': getattr(settings, 'FRAGMENT_CACHE_SECONDS', 600),
+        'cache_versions': Versions(),
+    }
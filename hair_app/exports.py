@@ -0,0 +1,114 @@
+"""
+Streaming CSV exports of donors, requests and confirmed matches.
+
+Rows are read with QuerySet.iterator() and written one at a time, so the
+first bytes go out immediately and memory use does not grow with the
+table size. Both server modes stream: on ASGI (uvicorn workers) Django 4.2
+would first collect a sync iterator into a list, so aexport_lines() reads
+the rows in keyset chunks of CHUNK_SIZE through sync_to_async instead.
+Text cells that a spreadsheet would read as a formula are prefixed with a
+quote, since most of the text comes from the public forms.
+"""
+import csv
+
+from asgiref.sync import sync_to_async
+
+from .filters import filter_donors, filter_requests
+from .models import HairDonor, HairRequest, DonationMatch
+
+CHUNK_SIZE = 2000
+
+# Leading characters that make spreadsheets evaluate a cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+DONOR_COLUMNS = [
+    'id', 'full_name', 'email', 'phone', 'age', 'gender', 'address', 'city', 'state', 'pincode',
+    'hair_length', 'hair_type', 'hair_color', 'hair_condition', 'willing_to_donate',
+    'donation_date', 'status', 'created_at', 'updated_at',
+]
+
+REQUEST_COLUMNS = [
+    'id', 'patient_name', 'email', 'phone', 'age', 'address', 'city', 'state', 'pincode',
+    'patient_type', 'medical_condition', 'urgency', 'required_hair_length',
+    'preferred_hair_color', 'preferred_hair_type', 'hospital_name', 'doctor_name', 'doctor_contact',
+    'request_status', 'matched_donor_id', 'created_at', 'updated_at',
+]
+
+MATCH_COLUMNS = [
+    'id', 'donor_id', 'donor__full_name', 'request_id', 'request__patient_name', 'matched_date',
+    'donation_completed', 'completion_date', 'rating', 'feedback',
+]
+
+
+def _donors(params):
+    donors = filter_donors(HairDonor.objects.all(), params)
+    if params.get('status'):
+        donors = donors.filter(status=params['status'])
+    return donors
+
+
+def _requests(params):
+    requests = filter_requests(HairRequest.objects.all(), params)
+    if params.get('request_status'):
+        requests = requests.filter(request_status=params['request_status'])
+    return requests
+
+
+def _matches(params):
+    matches = DonationMatch.objects.filter(is_proposal=False)
+    if params.get('donation_completed') in ('true', 'false'):
+        matches = matches.filter(donation_completed=params['donation_completed'] == 'true')
+    return matches
+
+
+EXPORTS = {
+    'donors': (_donors, DONOR_COLUMNS),
+    'requests': (_requests, REQUEST_COLUMNS),
+    'matches': (_matches, MATCH_COLUMNS),
+}
+
+
+def _safe_row(row):
+    return [f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+            for value in row]
+
+
+class Echo:
+    """File-like object that hands each written line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(kind, params):
+    """Header and data rows for an export, as tuples"""
+    queryset_for, columns = EXPORTS[kind]
+    yield columns
+    queryset = queryset_for(params).order_by('pk').values_list(*columns)
+    yield from queryset.iterator(chunk_size=CHUNK_SIZE)
+
+
+def export_lines(kind, params):
+    """CSV-encoded lines for an export"""
+    writer = csv.writer(Echo())
+    for row in export_rows(kind, params):
+        yield writer.writerow(_safe_row(row))
+
+
+async def aexport_lines(kind, params):
+    """export_lines() as an async iterator, for responses served over ASGI"""
+    queryset_for, columns = EXPORTS[kind]
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    # Building the queryset may look up a pincode centroid
+    queryset = await sync_to_async(queryset_for)(params)
+    queryset = queryset.order_by('pk').values_list('pk', *columns)
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = await sync_to_async(list)(chunk[:CHUNK_SIZE])
+        for row in rows:
+            yield writer.writerow(_safe_row(row[1:]))
+        if len(rows) < CHUNK_SIZE:
+            return
+        last_pk = rows[-1][0]
@@ -0,0 +1,41 @@
+"""
+Query-string filters shared by the listing pages and the CSV exports.
+"""
+from .geo import filter_near
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_donors(donors, params):
+    """Apply the donor_list filters (city, hair_color, min_length, near + radius)"""
+    city = params.get('city')
+    hair_color = params.get('hair_color')
+    min_length = _float_or_none(params.get('min_length'))
+    
+    if city:
+        donors = donors.filter(city__icontains=city)
+    if hair_color:
+        donors = donors.filter(hair_color=hair_color)
+    if min_length is not None:
+        donors = donors.filter(hair_length__gte=min_length)
+    return filter_near(donors, params)
+
+
+def filter_requests(requests, params):
+    """Apply the request_list filters (patient_type, urgency, city, near + radius)"""
+    patient_type = params.get('patient_type')
+    urgency = params.get('urgency')
+    city = params.get('city')
+    
+    if patient_type:
+        requests = requests.filter(patient_type=patient_type)
+    if urgency:
+        requests = requests.filter(urgency=urgency)
+    if city:
+        requests = requests.filter(city__icontains=city)
+    return filter_near(requests, params)
@@ -110,4 +110,7 @@ class CustomPasswordChangeForm(PasswordChangeForm):
     )
     new_password2 = forms.CharField(
         widget=forms.PasswordInput(attrs={'class': 'form-control', 'placeholder': 'Confirm New Password'})
-    )
\ No newline at end of file
+    )
+
+class ImportFileForm(forms.Form):
+    file = forms.FileField(help_text='CSV with a header row, or JSON lines (.jsonl)')
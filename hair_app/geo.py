@@ -0,0 +1,232 @@
+"""
+Pincode based locations and radius queries.
+
+Donors and requests get the latitude and longitude of their pincode from
+the PincodeCentroid table, falling back to the 3-digit prefix (the postal
+sorting district) when the full pincode is unknown. The bundled
+data/pincode_centroids.csv only has prefix centroids for the larger cities;
+`manage.py load_pincodes` loads a complete pincode directory.
+
+Each located row also stores the grid cell it falls in (CELL_DEGREES
+squares numbered row * CELL_COLUMNS + column). A radius query lists the
+cells overlapping the circle's bounding box and looks them up through the
+geo_cell indexes, so only nearby rows are read; the exact great-circle
+distance is then checked on those.
+"""
+import csv
+import math
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+BUNDLED_CENTROIDS = os.path.join(os.path.dirname(__file__), 'data', 'pincode_centroids.csv')
+
+# About 28 km north-south, so a 500 km radius covers ~1400 cells; changing
+# it needs the geo_cell columns recomputed (manage.py load_pincodes)
+CELL_DEGREES = 0.25
+CELL_COLUMNS = 10000
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+PREFIX_LENGTH = 3
+
+
+def max_radius_km():
+    return getattr(settings, 'GEO_MAX_RADIUS_KM', 500)
+
+
+def read_centroids(path=BUNDLED_CENTROIDS):
+    """Yield (pincode, latitude, longitude) from a CSV with those three columns"""
+    with open(path, newline='', encoding='utf-8') as handle:
+        for row in csv.DictReader(handle):
+            try:
+                latitude = float(row['latitude'])
+                longitude = float(row['longitude'])
+            except (KeyError, TypeError, ValueError):
+                # Directories mark unknown locations with NA or leave them blank
+                continue
+            pincode = (row.get('pincode') or '').strip()
+            if pincode and -90 <= latitude <= 90 and -180 <= longitude <= 180:
+                yield pincode, latitude, longitude
+
+
+def cell_for(latitude, longitude):
+    row = int((latitude + 90) // CELL_DEGREES)
+    column = int((longitude + 180) // CELL_DEGREES)
+    return row * CELL_COLUMNS + column
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance (haversine)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _normalize(pincode):
+    return (pincode or '').replace(' ', '')
+
+
+def _lookup_keys(pincode):
+    pincode = _normalize(pincode)
+    return [pincode, pincode[:PREFIX_LENGTH]] if len(pincode) > PREFIX_LENGTH else [pincode]
+
+
+def centroids_for(pincodes):
+    """{pincode: (latitude, longitude)} for the pincodes that can be located, in one query"""
+    from .models import PincodeCentroid
+
+    keys = {key for pincode in pincodes for key in _lookup_keys(pincode) if key}
+    known = {
+        row.pincode: (row.latitude, row.longitude)
+        for row in PincodeCentroid.objects.filter(pincode__in=keys)
+    }
+    found = {}
+    for pincode in pincodes:
+        for key in _lookup_keys(pincode):
+            if key in known:
+                found[pincode] = known[key]
+                break
+    return found
+
+
+def center(pincode):
+    """(latitude, longitude) of a pincode, or None"""
+    return centroids_for([pincode]).get(pincode)
+
+
+def locate(obj, centroids):
+    """Set latitude, longitude and geo_cell of a donor or request from `centroids`"""
+    point = centroids.get(obj.pincode)
+    if point is None:
+        obj.latitude = obj.longitude = obj.geo_cell = None
+    else:
+        obj.latitude, obj.longitude = point
+        obj.geo_cell = cell_for(*point)
+
+
+def locate_all(objects):
+    """locate() a batch of unsaved objects, e.g. before bulk_create"""
+    objects = list(objects)
+    centroids = centroids_for({obj.pincode for obj in objects})
+    for obj in objects:
+        locate(obj, centroids)
+    return objects
+
+
+def load_centroids(path=BUNDLED_CENTROIDS, replace=False, batch_size=1000):
+    """
+    Insert or update centroids from a CSV file; `replace` first drops the ones
+    already loaded. Returns the number of rows read.
+    """
+    from .models import PincodeCentroid
+
+    count = 0
+    batch = []
+    with transaction.atomic():
+        if replace:
+            PincodeCentroid.objects.all().delete()
+        for pincode, latitude, longitude in read_centroids(path):
+            batch.append(PincodeCentroid(pincode=pincode, latitude=latitude, longitude=longitude))
+            if len(batch) >= batch_size:
+                count += _save_centroids(batch)
+                batch = []
+        count += _save_centroids(batch)
+    return count
+
+
+def _save_centroids(batch):
+    from .models import PincodeCentroid
+
+    # Directories list a pincode once per post office; the last one wins
+    unique = list({row.pincode: row for row in batch}.values())
+    PincodeCentroid.objects.bulk_create(unique, update_conflicts=True, unique_fields=['pincode'],
+                                        update_fields=['latitude', 'longitude'])
+    return len(batch)
+
+
+def relocate(model, batch_size=1000):
+    """Recompute the location of every row, e.g. after loading new centroids"""
+    updated = 0
+    batch = []
+    for obj in model.objects.order_by().only('id', 'pincode').iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            updated += _save_locations(model, batch, batch_size)
+            batch = []
+    return updated + _save_locations(model, batch, batch_size)
+
+
+def _save_locations(model, batch, batch_size):
+    locate_all(batch)
+    model.objects.bulk_update(batch, ['latitude', 'longitude', 'geo_cell'], batch_size=batch_size)
+    return len(batch)
+
+
+def cells_around(latitude, longitude, radius_km):
+    """geo_cell numbers of every cell overlapping the circle's bounding box"""
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    lon_delta = 180.0 if cos_lat < 1e-6 else min(180.0, radius_km / (KM_PER_DEGREE * cos_lat))
+
+    first_row = cell_for(max(-90.0, latitude - lat_delta), 0) // CELL_COLUMNS
+    last_row = cell_for(min(89.999999, latitude + lat_delta), 0) // CELL_COLUMNS
+    first_column = cell_for(0, max(-180.0, longitude - lon_delta)) % CELL_COLUMNS
+    last_column = cell_for(0, min(179.999999, longitude + lon_delta)) % CELL_COLUMNS
+    return [
+        row * CELL_COLUMNS + column
+        for row in range(first_row, last_row + 1)
+        for column in range(first_column, last_column + 1)
+    ]
+
+
+def distance_expression(latitude, longitude):
+    """Haversine distance in km from a point to each row's latitude/longitude"""
+    lat0 = math.radians(latitude)
+    lon0 = math.radians(longitude)
+    half_dlat = (Radians(F('latitude')) - lat0) / 2
+    half_dlon = (Radians(F('longitude')) - lon0) / 2
+    a = Power(Sin(half_dlat), 2) + math.cos(lat0) * Cos(Radians(F('latitude'))) * Power(Sin(half_dlon), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def within(queryset, latitude, longitude, radius_km):
+    """Rows of a donor or request queryset within `radius_km`, annotated with distance_km"""
+    return (
+        queryset
+        .filter(geo_cell__in=cells_around(latitude, longitude, radius_km))
+        .annotate(distance_km=distance_expression(latitude, longitude))
+        .filter(distance_km__lte=radius_km)
+    )
+
+
+def parse_radius(value):
+    """A radius in km from a query parameter, capped at GEO_MAX_RADIUS_KM; None if invalid"""
+    try:
+        radius = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(radius) or radius <= 0:
+        return None
+    return min(radius, max_radius_km())
+
+
+def has_near_filter(params):
+    return bool(_normalize(params.get('near'))) and parse_radius(params.get('radius')) is not None
+
+
+def filter_near(queryset, params):
+    """
+    Apply the `near` (pincode) and `radius` (km) query parameters. An unknown
+    pincode matches nothing rather than silently dropping the filter.
+    """
+    if not has_near_filter(params):
+        return queryset
+    point = center(_normalize(params.get('near')))
+    if point is None:
+        return queryset.none()
+    return within(queryset, *point, parse_radius(params.get('radius')))
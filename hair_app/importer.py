@@ -0,0 +1,124 @@
+"""
+Bulk import of donor and request records from CSV or JSON-lines files.
+
+Rows are read one at a time, validated with the same ModelForms the public
+pages use, and written with bulk_create in chunks, each in its own
+transaction. Memory use depends on the chunk size, not the file size.
+After each committed chunk the last row number is reported so an
+interrupted import can be resumed from there.
+"""
+import csv
+import json
+
+from django.db import transaction
+
+from . import caching, changes, geo, search, stats
+from .forms import HairDonorForm, HairRequestForm
+from .models import HairDonor, HairRequest
+
+IMPORT_KINDS = {
+    'donors': (HairDonorForm, HairDonor, 'donor'),
+    'requests': (HairRequestForm, HairRequest, 'request'),
+}
+
+FORMATS = ['csv', 'jsonl']
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.last_row = 0
+
+
+def guess_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield (row_number, data) from a text stream. Row numbers start at 1."""
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            yield number, {key.strip(): (value or '').strip() for key, value in row.items() if key}
+    elif fmt == 'jsonl':
+        number = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                data = json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+                continue
+            yield number, data if isinstance(data, dict) else ValueError('Expected a JSON object')
+    else:
+        raise ValueError(f'Unknown format: {fmt}')
+
+
+def _format_errors(form):
+    return '; '.join(
+        f"{field}: {' '.join(messages)}" if field != '__all__' else ' '.join(messages)
+        for field, messages in form.errors.items()
+    )
+
+
+def _flush(model, kind, objects, result, last_row, on_progress):
+    # bulk_create skips save(), which locates the pincode
+    geo.locate_all(objects)
+    with transaction.atomic():
+        created = model.objects.bulk_create(objects)
+        # bulk_create skips post_save, so update what the signals would have
+        search.index_objects(kind, created)
+        changes.mark(kind, [obj.pk for obj in created])
+    result.created += len(created)
+    result.last_row = last_row
+    if on_progress:
+        on_progress(result)
+
+
+def import_rows(kind, rows, chunk_size=500, start_after=0, on_error=None, on_progress=None):
+    """
+    Validate and insert rows for `kind` ('donors' or 'requests').
+
+    `rows` yields (row_number, data) pairs. Rows numbered `start_after` or
+    lower are skipped. `on_error(row_number, message)` is called for each
+    rejected row and `on_progress(result)` after each committed chunk.
+    """
+    form_class, model, search_kind = IMPORT_KINDS[kind]
+    result = ImportResult()
+    result.last_row = start_after
+    chunk = []
+    last_row = start_after
+
+    for number, data in rows:
+        if number <= start_after:
+            continue
+        last_row = number
+        if isinstance(data, Exception):
+            result.failed += 1
+            if on_error:
+                on_error(number, str(data))
+            continue
+
+        form = form_class(data)
+        if not form.is_valid():
+            result.failed += 1
+            if on_error:
+                on_error(number, _format_errors(form))
+            continue
+
+        obj = form.save(commit=False)
+        if isinstance(obj, HairRequest):
+            obj.sync_urgency_priority()
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            _flush(model, search_kind, chunk, result, last_row, on_progress)
+            chunk = []
+
+    if chunk:
+        _flush(model, search_kind, chunk, result, last_row, on_progress)
+    result.last_row = last_row
+    stats.invalidate()
+    caching.bump(kind)
+    return result
@@ -0,0 +1,228 @@
+"""
+Database-backed background jobs.
+
+Functions registered with @task are queued as Job rows by enqueue() and
+run by `manage.py run_jobs`, which claims due jobs with conditional
+UPDATEs in a short transaction that one worker holds at a time (so any
+number of workers can share the table) and runs them on a thread pool.
+Failed jobs are retried with exponential backoff until max_attempts, a
+task can cap how many of its jobs run at once, and JOB_SCHEDULE queues
+tasks periodically. Task definitions live in tasks.py.
+"""
+import logging
+import os
+import socket
+import threading
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TaskSpec = namedtuple('TaskSpec', ['func', 'max_attempts', 'retry_delay', 'concurrency'])
+
+# name -> TaskSpec
+TASKS = {}
+
+# PostgreSQL advisory lock key held while claiming
+CLAIM_LOCK_ID = 7120314
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task(name=None, max_attempts=3, retry_delay=30, concurrency=None):
+    """
+    Register a function as a background task. `retry_delay` is the wait in
+    seconds before the first retry, doubling after each failure;
+    `concurrency` limits how many of its jobs run at once across workers.
+    """
+    def register(func):
+        TASKS[name or func.__name__] = TaskSpec(func, max_attempts, retry_delay, concurrency)
+        return func
+    return register
+
+
+def enqueue(name, *args, delay=0, run_at=None, unique_key=None, schedule_key=None):
+    """
+    Queue a task; args must be JSON serialisable. With `unique_key`, nothing
+    is queued (and None returned) while a job with the same key is waiting;
+    the key is released when a worker picks the job up, so work arriving
+    during a run queues a fresh one. A `schedule_key` is never released, so
+    it queues at most one job until the row is purged.
+    """
+    if name not in TASKS:
+        raise KeyError(f'Unknown task: {name}')
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay)
+    job = Job(task=name, args=list(args), run_at=run_at, unique_key=unique_key, schedule_key=schedule_key,
+              max_attempts=TASKS[name].max_attempts)
+    if unique_key is None and schedule_key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return None
+    return job
+
+
+def backoff(spec, attempts):
+    """Seconds to wait before retrying after the `attempts`-th failure"""
+    return min(spec.retry_delay * 2 ** (attempts - 1), _setting('JOB_MAX_BACKOFF_SECONDS', 3600))
+
+
+def enqueue_scheduled(now=None):
+    """Queue every JOB_SCHEDULE task whose period has started and not been queued yet"""
+    now = now or timezone.now()
+    queued = 0
+    for name, every in _setting('JOB_SCHEDULE', {}).items():
+        slot = int(now.timestamp() // every)
+        slot_start = datetime.fromtimestamp(slot * every, tz=dt_timezone.utc)
+        # Keyed on the period, so ad-hoc jobs of the same task don't count
+        schedule_key = f'{name}:{slot}'
+        if Job.objects.filter(schedule_key=schedule_key).exists():
+            continue
+        if enqueue(name, run_at=slot_start, schedule_key=schedule_key):
+            queued += 1
+    return queued
+
+
+def lock_timeout():
+    """How long a job may run before release_stale() assumes its worker died"""
+    return timedelta(seconds=_setting('JOB_LOCK_TIMEOUT', 30 * 60))
+
+
+def _lock_claims():
+    """
+    Serialize claim() across workers for the rest of the transaction, so the
+    Running counts it checks concurrency limits against can't go stale.
+    SQLite transactions already hold the write lock from BEGIN IMMEDIATE.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CLAIM_LOCK_ID])
+
+
+def release_stale(now=None):
+    """Requeue jobs whose worker died mid-run (locked longer than JOB_LOCK_TIMEOUT)"""
+    now = now or timezone.now()
+    cutoff = now - lock_timeout()
+    stale = Job.objects.filter(status='Running', locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='Failed', last_error='Worker stopped before the job finished', updated_at=now)
+    requeued = stale.update(status='Queued', locked_by='', locked_at=None, run_at=now, updated_at=now)
+    return failed + requeued
+
+
+def claim(worker_id, limit):
+    """Lock up to `limit` due jobs for this worker and return their ids"""
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    claimed = []
+    with transaction.atomic():
+        _lock_claims()
+        running = Counter(Job.objects.filter(status='Running').values_list('task', flat=True))
+        due = Job.objects.filter(status='Queued', run_at__lte=now).order_by('run_at', 'id')
+        # Look a little past `limit` so jobs held back by concurrency limits don't starve the rest
+        for pk, name in due.values_list('pk', 'task')[:limit * 4]:
+            spec = TASKS.get(name)
+            if spec and spec.concurrency is not None and running[name] >= spec.concurrency:
+                continue
+            locked = Job.objects.filter(pk=pk, status='Queued').update(
+                status='Running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1, unique_key=None,
+                updated_at=now)
+            if locked:
+                claimed.append(pk)
+                running[name] += 1
+                if len(claimed) == limit:
+                    break
+    return claimed
+
+
+def run_job(pk):
+    """Run one claimed job and record the outcome; returns the new status"""
+    job = Job.objects.get(pk=pk)
+    spec = TASKS.get(job.task)
+    try:
+        if spec is None:
+            raise KeyError(f'Unknown task: {job.task}')
+        spec.func(*job.args)
+    except Exception as exc:
+        now = timezone.now()
+        error = f'{type(exc).__name__}: {exc}'
+        if spec is not None and job.attempts < job.max_attempts:
+            delay = backoff(spec, job.attempts)
+            logger.warning('Job %s (%s) failed, retrying in %ss: %s', pk, job.task, delay, error)
+            Job.objects.filter(pk=pk).update(status='Queued', locked_by='', locked_at=None, last_error=error,
+                                             run_at=now + timedelta(seconds=delay), updated_at=now)
+            return 'Queued'
+        logger.exception('Job %s (%s) failed permanently', pk, job.task)
+        Job.objects.filter(pk=pk).update(status='Failed', locked_at=None, last_error=error, updated_at=now)
+        return 'Failed'
+
+    Job.objects.filter(pk=pk).update(status='Done', locked_at=None, updated_at=timezone.now())
+    return 'Done'
+
+
+def run_pending(worker_id='inline', limit=100):
+    """Run due jobs in the current thread, e.g. from tests; returns their statuses"""
+    return [run_job(pk) for pk in claim(worker_id, limit)]
+
+
+def purge(days=None):
+    """Delete finished jobs older than JOB_RETENTION_DAYS"""
+    days = _setting('JOB_RETENTION_DAYS', 7) if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status__in=['Done', 'Failed'], updated_at__lt=cutoff).delete()
+    return deleted
+
+
+class Worker:
+    """Polls the job table and runs claimed jobs on a thread pool"""
+
+    def __init__(self, concurrency=None, poll_interval=None):
+        self.concurrency = concurrency or _setting('JOB_WORKERS', 4)
+        self.poll_interval = poll_interval or _setting('JOB_POLL_SECONDS', 5)
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.running = set()
+        self.stopping = threading.Event()
+
+    def _run_in_thread(self, pk):
+        try:
+            run_job(pk)
+        except Exception:
+            logger.exception('Job %s could not be run', pk)
+        finally:
+            # Worker threads get their own connections; don't leave them open
+            connections.close_all()
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self, burst=False):
+        """Process jobs until stop(); with `burst`, return once the queue is empty"""
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='jobs') as executor:
+            while not self.stopping.is_set():
+                self.running = {future for future in self.running if not future.done()}
+                release_stale()
+                enqueue_scheduled()
+                claimed = claim(self.worker_id, self.concurrency - len(self.running))
+                for pk in claimed:
+                    self.running.add(executor.submit(self._run_in_thread, pk))
+                if burst and not claimed and not self.running:
+                    break
+                if self.running and len(self.running) >= self.concurrency:
+                    wait(self.running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                elif not claimed:
+                    self.stopping.wait(self.poll_interval)
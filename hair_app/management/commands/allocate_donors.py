@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from hair_app.allocation import allocate
+
+
+class Command(BaseCommand):
+    help = ('Assign available donors to all open requests at once, maximising the total match score, '
+            'and save the confirmed matches')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Plan the allocation without saving it')
+        parser.add_argument('--candidates', type=int, default=None,
+                            help='Donors considered per request (defaults to ALLOCATION_CANDIDATES_PER_REQUEST)')
+        parser.add_argument('--max-distance', type=float, default=None,
+                            help='Furthest donor considered in km (defaults to ALLOCATION_MAX_DISTANCE_KM)')
+
+    def handle(self, *args, **options):
+        result = allocate(limit=options['candidates'], max_distance=options['max_distance'],
+                          dry_run=options['dry_run'])
+        self.stdout.write(f'{result.requests} open request(s), {result.donors} available donor(s), '
+                          f'{result.edges} candidate pair(s)')
+        verb = 'Would allocate' if options['dry_run'] else 'Allocated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(result.pairs)} donor(s), total score {result.total_score}'
+        ))
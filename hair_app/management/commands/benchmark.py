@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from hair_app import benchmark, synthetic
+
+
+class Command(BaseCommand):
+    help = ('Fill a throwaway test database to each --scale, request every hair_app page and '
+            'report latency percentiles and query counts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, action='append',
+                            help='Total rows to benchmark at; repeatable (default: 1000 and 10000)')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--pages', nargs='*', help='Only these URL names')
+        parser.add_argument('--cache', action='store_true', help='Keep the configured cache instead of a dummy one')
+        parser.add_argument('--save', metavar='PATH', help='Write the results as a JSON baseline')
+        parser.add_argument('--compare', metavar='PATH', help='Report regressions against a saved baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p90 latency growth before it counts as a regression')
+        parser.add_argument('--min-ms', type=float, default=5.0,
+                            help='Ignore p90 growth smaller than this many milliseconds')
+
+    def handle(self, *args, **options):
+        scales = sorted(options['scale'] or [1000, 10000])
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run_scales(scales, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['save']:
+            benchmark.save(options['save'], results)
+            self.stdout.write(f"Saved results to {options['save']}")
+        if options['compare']:
+            problems = benchmark.compare(benchmark.load(options['compare']), results,
+                                       options['tolerance'], options['min_ms'])
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            if problems:
+                raise CommandError(f'{len(problems)} regression(s) against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def run_scales(self, scales, options):
+        results = {}
+        generated = synthetic.counts_for(0)
+        for scale in scales:
+            wanted = synthetic.counts_for(scale)
+            synthetic.generate(seed=scale, **{name: wanted[name] - generated[name] for name in wanted})
+            generated = wanted
+
+            pages = benchmark.run(options['iterations'], options['warmup'], options['cache'], options['pages'])
+            results[str(scale)] = pages
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{scale} rows'))
+            self.stdout.write(f'{"page":<22}{"status":>7}{"queries":>9}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}')
+            for name, row in pages.items():
+                self.stdout.write(f'{name:<22}{row["status"]:>7}{row["queries"]:>9}'
+                                  f'{row["p50_ms"]:>10}{row["p90_ms"]:>10}{row["p99_ms"]:>10}')
+        return results
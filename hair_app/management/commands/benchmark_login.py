@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from hair_app import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Report the CPU cost per password hash and the login latency of each password hasher, '
+            'on a throwaway test database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasher', action='append',
+                            help='Dotted path of a hasher; repeatable (default: PASSWORD_HASHERS)')
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--warmup', type=int, default=1)
+
+    def handle(self, *args, **options):
+        hashers = options['hasher'] or settings.PASSWORD_HASHERS
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f'{"hasher":<16}{"hash ms":>9}{"cpu ms":>9}{"logins/s/core":>15}'
+                              f'{"login p50":>11}{"login p90":>11}{"queries":>9}')
+            for path in hashers:
+                try:
+                    cost = benchmark.hasher_cost(path, options['iterations'])
+                except ValueError:
+                    self.stdout.write(f'{path.rsplit(".", 1)[-1]:<16} not installed')
+                    continue
+                login = benchmark.login_cost(path, options['iterations'], options['warmup'])
+                per_core = round(1000 / cost['cpu_ms']) if cost['cpu_ms'] else '-'
+                self.stdout.write(f'{cost["algorithm"]:<16}{cost["hash_ms"]:>9}{cost["cpu_ms"]:>9}{per_core:>15}'
+                                  f'{login["p50_ms"]:>11}{login["p90_ms"]:>11}{login["queries"]:>9}')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from hair_app.matching import refresh_changed, run_matching
+
+
+class Command(BaseCommand):
+    help = 'Score all open hair requests against available donors and store the ranked proposals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Proposals to keep per request (defaults to MATCH_CANDIDATES_PER_REQUEST)')
+        parser.add_argument('--changed', action='store_true',
+                            help='Only rescore the donors and requests changed since the last run')
+
+    def handle(self, *args, **options):
+        if options['changed']:
+            count = refresh_changed(limit=options['limit'])
+            self.stdout.write(self.style.SUCCESS(f'Applied {count} recorded change(s)'))
+            return
+        count = run_matching(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} match proposal(s)'))
@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from hair_app import urls
+from hair_app.models import HairRequest
+
+# Views that change state on GET
+SKIP_VIEWS = {'logout'}
+
+
+def _sample_request():
+    pk = HairRequest.objects.values_list('pk', flat=True).first()
+    return {'pk': pk} if pk is not None else None
+
+
+# Sample URL arguments for views that take them
+SAMPLE_KWARGS = {
+    'request_detail': _sample_request,
+}
+
+
+class QueryRecorder:
+    """Execute wrapper collecting every SELECT with its parameters"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def full_scans(plan_rows):
+    """Plan lines that read a whole table instead of using an index"""
+    scans = []
+    for row in plan_rows:
+        line = ' '.join(str(col) for col in row)
+        if connection.vendor == 'sqlite':
+            if 'SCAN ' in line and 'USING' not in line:
+                scans.append(line)
+        elif 'Seq Scan' in line:
+            scans.append(line)
+    return scans
+
+
+class Command(BaseCommand):
+    help = "Print the query plan of every SELECT issued by each view in hair_app.urls"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', action='append', dest='views',
+                            help='Only explain this URL name (may be repeated)')
+        parser.add_argument('--username',
+                            help='Log in as this user for views that require authentication')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any query plan contains a full table scan')
+
+    def handle(self, *args, **options):
+        client = Client()
+        if options['username']:
+            try:
+                client.force_login(User.objects.get(username=options['username']))
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' does not exist")
+
+        prefix = connection.ops.explain_query_prefix()
+        scan_count = 0
+
+        for pattern in urls.urlpatterns:
+            name = pattern.name
+            if name in SKIP_VIEWS or (options['views'] and name not in options['views']):
+                continue
+            kwargs = {}
+            if pattern.pattern.converters:
+                kwargs = SAMPLE_KWARGS[name]() if name in SAMPLE_KWARGS else None
+                if kwargs is None:
+                    self.stdout.write(self.style.WARNING(f'{name}: no sample arguments, skipped'))
+                    continue
+
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = client.get(reverse(name, kwargs=kwargs))
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name} ({response.status_code}): {len(recorder.queries)} SELECT(s)'
+            ))
+            for sql, params in recorder.queries:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'{prefix} {sql}', params)
+                    plan = cursor.fetchall()
+                self.stdout.write(f'  {sql}')
+                for row in plan:
+                    self.stdout.write('    ' + ' '.join(str(col) for col in row))
+                for line in full_scans(plan):
+                    scan_count += 1
+                    self.stdout.write(self.style.WARNING(f'    full scan: {line}'))
+
+        if scan_count and options['fail_on_scan']:
+            raise CommandError(f'{scan_count} full table scan(s) found')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hair_app.exports import EXPORTS, export_lines
+
+
+class Command(BaseCommand):
+    help = 'Stream donors, requests or matches as CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout')
+        parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                            help='Same filters as the listing pages, e.g. city=Pune (may be repeated)')
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Filters must look like NAME=VALUE, got {item!r}')
+            params[name] = value
+
+        if not options['output']:
+            for line in export_lines(options['kind'], params):
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='') as stream:
+            for line in export_lines(options['kind'], params):
+                stream.write(line)
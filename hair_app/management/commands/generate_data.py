@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from hair_app import synthetic
+
+
+class Command(BaseCommand):
+    help = 'Add synthetic donors, requests, matches and users for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0,
+                            help='Total rows, split 40/30/20/10 across donors, requests, matches and users')
+        parser.add_argument('--donors', type=int, default=None)
+        parser.add_argument('--requests', type=int, default=None)
+        parser.add_argument('--matches', type=int, default=None)
+        parser.add_argument('--users', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        counts = synthetic.counts_for(options['rows'])
+        for name in counts:
+            if options[name] is not None:
+                counts[name] = options[name]
+
+        def on_progress(name, done):
+            self.stdout.write(f'{name}: {done}/{counts[name]}', ending='\r')
+            self.stdout.flush()
+
+        created = synthetic.generate(seed=options['seed'], batch_size=options['batch_size'],
+                                     on_progress=on_progress, **counts)
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(f'{count} {name}' for name, count in created.items())
+        ))
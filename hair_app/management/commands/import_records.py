@@ -0,0 +1,66 @@
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hair_app.importer import FORMATS, IMPORT_KINDS, guess_format, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import donors or requests from a CSV or JSON-lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORT_KINDS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='File format (guessed from the extension by default)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Rows written per transaction')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the last row committed by a previous run')
+        parser.add_argument('--errors', metavar='PATH',
+                            help='Write rejected rows to this CSV file instead of stderr')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'{path} does not exist')
+        progress_path = path.with_name(path.name + '.progress')
+
+        start_after = 0
+        if options['resume'] and progress_path.exists():
+            start_after = int(progress_path.read_text().strip() or 0)
+            self.stdout.write(f'Resuming after row {start_after}')
+
+        error_file = open(options['errors'], 'a', newline='') if options['errors'] else None
+        error_writer = csv.writer(error_file) if error_file else None
+
+        def on_error(row_number, message):
+            if error_writer:
+                error_writer.writerow([row_number, message])
+            else:
+                self.stderr.write(f'row {row_number}: {message}')
+
+        def on_progress(result):
+            progress_path.write_text(str(result.last_row))
+            self.stdout.write(f'  committed up to row {result.last_row} ({result.created} created)')
+
+        fmt = options['format'] or guess_format(path.name)
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as stream:
+                result = import_rows(
+                    options['kind'],
+                    read_rows(stream, fmt),
+                    chunk_size=options['chunk_size'],
+                    start_after=start_after,
+                    on_error=on_error,
+                    on_progress=on_progress,
+                )
+        finally:
+            if error_file:
+                error_file.close()
+
+        progress_path.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} {options["kind"]}, rejected {result.failed} row(s)'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from hair_app import caching, geo, tasks
+from hair_app.models import HairDonor, HairRequest
+
+
+class Command(BaseCommand):
+    help = ('Load pincode centroids from a CSV with pincode, latitude and longitude columns '
+            '(default: the bundled prefix table) and relocate every donor and request')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=geo.BUNDLED_CENTROIDS)
+        parser.add_argument('--replace', action='store_true', help='Drop the centroids loaded so far')
+
+    def handle(self, *args, **options):
+        count = geo.load_centroids(options['path'], replace=options['replace'])
+        self.stdout.write(f'Loaded {count} centroid(s) from {options["path"]}')
+        donors = geo.relocate(HairDonor)
+        requests = geo.relocate(HairRequest)
+        caching.bump('donors', 'requests')
+        # Location feeds the match scores
+        tasks.schedule_matching()
+        self.stdout.write(self.style.SUCCESS(f'Relocated {donors} donor(s) and {requests} request(s)'))
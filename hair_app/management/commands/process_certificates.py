@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from hair_app import uploads
+from hair_app.models import HairRequest
+
+
+class Command(BaseCommand):
+    help = 'Process staged medical certificates, e.g. those left behind by a restart'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-processing', action='store_true',
+                            help="Also retry certificates stuck in 'Processing' (only when no workers are running)")
+
+    def handle(self, *args, **options):
+        if options['include_processing']:
+            HairRequest.objects.filter(certificate_status='Processing').update(certificate_status='Pending')
+
+        pending = HairRequest.objects.filter(certificate_status='Pending').values_list('pk', flat=True)
+        results = {'Ready': 0, 'Failed': 0}
+        for pk in list(pending):
+            status = uploads.process_certificate(pk)
+            if status:
+                results[status] += 1
+        self.stdout.write(f"{results['Ready']} certificate(s) stored, {results['Failed']} rejected")
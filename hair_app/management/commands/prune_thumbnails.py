@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hair_app import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Remove least recently used thumbnails until the cache is under THUMBNAIL_MAX_BYTES'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-bytes', type=int, help='Size limit to prune to instead of THUMBNAIL_MAX_BYTES')
+
+    def handle(self, *args, **options):
+        removed = thumbnails.evict(options['max_bytes'])
+        self.stdout.write(f'{removed} thumbnail(s) removed')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hair_app import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for donors and requests'
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            self.stdout.write(self.style.WARNING('Full-text index is only used on SQLite; nothing to do'))
+            return
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} row(s)'))
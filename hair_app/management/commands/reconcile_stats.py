@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from hair_app import stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the cached home page statistics'
+
+    def handle(self, *args, **options):
+        for name, value in stats.reconcile().items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hair_app import reports
+
+
+class Command(BaseCommand):
+    help = 'Update the daily reporting rollups from the rows changed since the last refresh'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every day instead')
+
+    def handle(self, *args, **options):
+        for source, days in reports.refresh(full=options['full']).items():
+            self.stdout.write(f'{source}: {days} day(s) regrouped')
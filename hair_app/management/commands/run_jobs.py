@@ -0,0 +1,25 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from hair_app.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (matching, certificates, maintenance) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Jobs run at once by this worker (defaults to JOB_WORKERS)')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is due instead of polling forever')
+
+    def handle(self, *args, **options):
+        worker = Worker(concurrency=options['concurrency'])
+        # Finish the jobs in hand on SIGTERM rather than abandoning them as 'Running'
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        self.stdout.write(f'Worker {worker.worker_id} running {worker.concurrency} job(s) at a time')
+        try:
+            worker.run(burst=options['burst'])
+        except KeyboardInterrupt:
+            worker.stop()
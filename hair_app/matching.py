@@ -0,0 +1,388 @@
+"""
+Donor/request matching engine.
+
+Scores every open HairRequest against the pool of available HairDonors in a
+single bulk pass and stores the best candidates per request as proposed
+DonationMatch rows, so request pages only read a precomputed ranking.
+Between full runs, refresh_changed() keeps the proposals current by
+rescoring only the donors and requests recorded by hair_app.changes.
+"""
+import heapq
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+
+from . import geo
+from .models import HairDonor, HairRequest, DonationMatch, MatchChange
+
+# Requests that still need a donor
+OPEN_REQUEST_STATUSES = ['Pending', 'Approved']
+
+# Relative weight of each scoring component
+LENGTH_WEIGHT = 2.0
+COLOR_WEIGHT = 3.0
+TYPE_WEIGHT = 2.0
+LOCATION_WEIGHT = 3.0
+
+# Extra weight on the length and location components per urgency level
+# above Low: the more urgent a request, the more a nearby donor with just
+# enough hair counts against one that only matches its preferences
+URGENCY_WEIGHT = 0.25
+
+# Surplus (in inches) at which the length component drops to half
+LENGTH_SURPLUS_HALF = 6.0
+
+# Distance (in km) at which the location component drops to half of its
+# same-area value; an identical pincode still scores highest
+DISTANCE_HALF_KM = 25.0
+SAME_AREA_SCORE = 0.9
+
+DONOR_FIELDS = ['id', 'hair_length', 'hair_color', 'hair_type', 'city', 'state', 'pincode',
+                'latitude', 'longitude']
+REQUEST_FIELDS = ['id', 'required_hair_length', 'preferred_hair_color', 'preferred_hair_type',
+                  'city', 'state', 'pincode', 'latitude', 'longitude', 'urgency_priority']
+
+
+def candidates_per_request():
+    """Number of proposals kept for each request"""
+    return getattr(settings, 'MATCH_CANDIDATES_PER_REQUEST', 5)
+
+
+def available_donors():
+    """Donors that can currently be proposed"""
+    return HairDonor.objects.filter(status='Available', willing_to_donate=True)
+
+
+def open_requests():
+    """Requests that are still waiting for a donor, most urgent first"""
+    return (
+        HairRequest.objects
+        .filter(request_status__in=OPEN_REQUEST_STATUSES)
+        .order_by('-urgency_priority', 'created_at')
+    )
+
+
+def preference_score(preference, value):
+    """1 for a match, 0 for a mismatch and 0.5 when there is no preference"""
+    preference = (preference or '').strip().lower()
+    if not preference:
+        return 0.5
+    value = (value or '').lower()
+    return 1.0 if value and (value in preference or preference in value) else 0.0
+
+
+def location_score(hair_request, donor):
+    if hair_request.pincode and hair_request.pincode == donor.pincode:
+        return 1.0
+    if hair_request.latitude is not None and donor.latitude is not None:
+        distance = geo.distance_km(hair_request.latitude, hair_request.longitude, donor.latitude, donor.longitude)
+        return SAME_AREA_SCORE * DISTANCE_HALF_KM / (DISTANCE_HALF_KM + distance)
+    # Pincodes without a known centroid: compare the names
+    if hair_request.city.strip().lower() == donor.city.strip().lower():
+        return 0.75
+    if hair_request.state.strip().lower() == donor.state.strip().lower():
+        return 0.4
+    return 0.0
+
+
+def length_score(surplus):
+    """Weighted length component; a closer fit wastes less hair"""
+    return LENGTH_WEIGHT * LENGTH_SURPLUS_HALF / (LENGTH_SURPLUS_HALF + surplus)
+
+
+def urgency_factor(hair_request):
+    """Multiplier of a request's length and location components"""
+    return 1 + URGENCY_WEIGHT * max(hair_request.urgency_priority - 1, 0)
+
+
+def score_pair(hair_request, donor):
+    """
+    Score a donor for a request, or return None if the donor cannot
+    satisfy it. Higher is better.
+    """
+    surplus = donor.hair_length - hair_request.required_hair_length
+    if surplus < 0:
+        return None
+
+    fit = length_score(surplus) + LOCATION_WEIGHT * location_score(hair_request, donor)
+    score = urgency_factor(hair_request) * fit
+    score += COLOR_WEIGHT * preference_score(hair_request.preferred_hair_color, donor.hair_color)
+    score += TYPE_WEIGHT * preference_score(hair_request.preferred_hair_type, donor.hair_type)
+    return round(score, 4)
+
+
+class DonorPool:
+    """Available donors sorted by hair length for fast length cut-offs"""
+
+    def __init__(self, donors):
+        self.donors = sorted(donors, key=lambda donor: donor.hair_length)
+        self.lengths = [donor.hair_length for donor in self.donors]
+
+    @classmethod
+    def load(cls):
+        return cls(available_donors().values_list(*DONOR_FIELDS, named=True))
+
+    def rank(self, hair_request, limit):
+        """Best `limit` (score, donor_id) pairs for a request"""
+        start = bisect_left(self.lengths, hair_request.required_hair_length)
+        scored = (
+            (score_pair(hair_request, donor), donor.id)
+            for donor in self.donors[start:]
+        )
+        return heapq.nlargest(limit, scored)
+
+
+def rank_requests(hair_requests, pool, limit=None):
+    """Yield unsaved proposal DonationMatch objects for the given requests"""
+    limit = limit or candidates_per_request()
+    for hair_request in hair_requests:
+        for score, donor_id in pool.rank(hair_request, limit):
+            yield DonationMatch(
+                donor_id=donor_id,
+                request_id=hair_request.id,
+                score=score,
+                is_proposal=True,
+            )
+
+
+def _delete_proposals(queryset):
+    """
+    Delete proposal rows without loading them and return how many went.
+    Nothing references a DonationMatch and the delete receivers ignore
+    proposals, so Django's collector would fetch every row only to send
+    signals that do nothing.
+    """
+    return queryset._raw_delete(queryset.db)
+
+
+def _last_change_id():
+    return MatchChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def run_matching(limit=None, batch_size=500):
+    """
+    Recompute proposals for every open request in one pass.
+    Returns the number of proposals written.
+    """
+    # Changes recorded before the data is read are covered by this run
+    covered = _last_change_id()
+    pool = DonorPool.load()
+    hair_requests = open_requests().values_list(*REQUEST_FIELDS, named=True)
+    proposals = list(rank_requests(hair_requests.iterator(), pool, limit))
+
+    with transaction.atomic():
+        _delete_proposals(DonationMatch.objects.filter(is_proposal=True))
+        DonationMatch.objects.bulk_create(proposals, batch_size=batch_size)
+        MatchChange.objects.filter(id__lte=covered).delete()
+    return len(proposals)
+
+
+# ---------------------------------------------------------------------------
+# Incremental updates
+# ---------------------------------------------------------------------------
+
+def _chunks(items, size=500):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _stored_proposals(request_ids):
+    """{request_id: {donor_id: (pk, score)}} for the given requests' proposals"""
+    stored = {}
+    for chunk in _chunks(request_ids):
+        rows = (
+            DonationMatch.objects.filter(is_proposal=True, request_id__in=chunk)
+            .values_list('pk', 'request_id', 'donor_id', 'score')
+        )
+        for pk, request_id, donor_id, score in rows:
+            stored.setdefault(request_id, {})[donor_id] = (pk, score)
+    return stored
+
+
+def _offer(ranked, donor_id, score, limit):
+    """
+    Update a request's top `limit` {donor_id: score} with a rescored donor.
+    Returns False when that is not enough because the donor got worse, in
+    which case a donor outside the ranking may now belong in it.
+    """
+    previous = ranked.get(donor_id)
+    if previous is not None:
+        if score is None or score < previous:
+            return False
+        ranked[donor_id] = score
+        return True
+    if score is None:
+        return True
+    if len(ranked) < limit:
+        ranked[donor_id] = score
+        return True
+    # Same ordering as DonorPool.rank: score, then donor id
+    worst_id, worst_score = min(ranked.items(), key=lambda item: (item[1], item[0]))
+    if (score, donor_id) > (worst_score, worst_id):
+        del ranked[worst_id]
+        ranked[donor_id] = score
+    return True
+
+
+def apply_changes(donor_ids, request_ids, limit=None, batch_size=500):
+    """
+    Bring the stored proposals up to date after the given donors and
+    requests changed, rescoring only the affected pairs: a changed donor
+    against the rankings it is in or is long enough to enter, and a changed
+    request (or one whose ranking lost a donor) against the donor pool.
+    Returns the number of proposals written or removed.
+    """
+    limit = limit or candidates_per_request()
+    donor_ids = set(donor_ids)
+    request_ids = set(request_ids)
+    open_ids = set()
+    for chunk in _chunks(request_ids):
+        open_ids.update(open_requests().filter(id__in=chunk).values_list('id', flat=True))
+    rerank = set(open_ids)
+    closed = request_ids - open_ids
+
+    stale_pks = []
+    rescored = {}
+    if donor_ids:
+        donors = []
+        for chunk in _chunks(donor_ids):
+            donors.extend(available_donors().filter(id__in=chunk).values_list(*DONOR_FIELDS, named=True))
+        eligible = {donor.id for donor in donors}
+
+        holding = set()
+        for chunk in _chunks(donor_ids):
+            rows = DonationMatch.objects.filter(is_proposal=True, donor_id__in=chunk)
+            for request_id, donor_id in rows.values_list('request_id', 'donor_id'):
+                if donor_id in eligible:
+                    holding.add(request_id)
+                else:
+                    # Deleted or no longer available: its slot needs the next best donor
+                    rerank.add(request_id)
+
+        # Rescore the requests ranking a changed donor, and offer the donors
+        # to the ones they are long enough for
+        candidates = open_requests().values_list(*REQUEST_FIELDS, named=True)
+        scan = {}
+        if donors:
+            longest = max(donor.hair_length for donor in donors)
+            for hair_request in candidates.filter(required_hair_length__lte=longest).iterator(chunk_size=2000):
+                scan[hair_request.id] = hair_request
+        for chunk in _chunks(holding - scan.keys()):
+            scan.update((hair_request.id, hair_request) for hair_request in candidates.filter(id__in=chunk))
+        scan = [hair_request for request_id, hair_request in scan.items() if request_id not in rerank]
+        stored = _stored_proposals(hair_request.id for hair_request in scan)
+
+        for hair_request in scan:
+            before = {donor_id: score for donor_id, (_, score) in stored.get(hair_request.id, {}).items()}
+            ranked = dict(before)
+            if all(_offer(ranked, donor.id, score_pair(hair_request, donor), limit) for donor in donors):
+                if ranked != before:
+                    rescored[hair_request.id] = (before, ranked)
+            else:
+                rerank.add(hair_request.id)
+
+        for request_id, (before, ranked) in rescored.items():
+            for donor_id in before:
+                if donor_id not in ranked or ranked[donor_id] != before[donor_id]:
+                    stale_pks.append(stored[request_id][donor_id][0])
+
+    proposals = [
+        DonationMatch(donor_id=donor_id, request_id=request_id, score=score, is_proposal=True)
+        for request_id, (before, ranked) in rescored.items()
+        for donor_id, score in ranked.items()
+        if before.get(donor_id) != score
+    ]
+    if rerank:
+        pool = DonorPool.load()
+        for chunk in _chunks(rerank):
+            hair_requests = open_requests().filter(id__in=chunk).values_list(*REQUEST_FIELDS, named=True)
+            proposals.extend(rank_requests(hair_requests, pool, limit))
+
+    with transaction.atomic():
+        removed = 0
+        for chunk in _chunks(rerank | closed):
+            removed += _delete_proposals(DonationMatch.objects.filter(is_proposal=True, request_id__in=chunk))
+        for chunk in _chunks(stale_pks):
+            removed += _delete_proposals(DonationMatch.objects.filter(is_proposal=True, pk__in=chunk))
+        DonationMatch.objects.bulk_create(proposals, batch_size=batch_size)
+    return removed + len(proposals)
+
+
+def refresh_changed(limit=None, batch_size=5000):
+    """
+    Apply the recorded MatchChange rows, `batch_size` at a time, and delete
+    them. Returns the number of changes processed.
+    """
+    processed = 0
+    while True:
+        changes = list(MatchChange.objects.order_by('id').values_list('id', 'kind', 'object_id')[:batch_size])
+        if not changes:
+            return processed
+        with transaction.atomic():
+            apply_changes(
+                {object_id for _, kind, object_id in changes if kind == 'donor'},
+                {object_id for _, kind, object_id in changes if kind == 'request'},
+                limit,
+            )
+            MatchChange.objects.filter(id__lte=changes[-1][0]).delete()
+        processed += len(changes)
+
+
+def _nearby(hair_request, radius_km):
+    return geo.within(
+        available_donors().filter(hair_length__gte=hair_request.required_hair_length),
+        hair_request.latitude, hair_request.longitude, radius_km,
+    )
+
+
+def _rank_nearby(hair_request, donors, limit):
+    scored = [(score_pair(hair_request, donor), -donor.distance_km, donor.id, donor) for donor in donors]
+    best = heapq.nlargest(limit or candidates_per_request(), scored, key=lambda item: item[:3])
+    for score, _, _, donor in best:
+        donor.match_score = score
+    return [donor for *_, donor in best]
+
+
+def nearby_donors(hair_request, radius_km, limit=None):
+    """
+    Best available donors within `radius_km` of a request, scored live rather
+    than read from the proposals; each has match_score and distance_km set.
+    Empty when the request's pincode cannot be located.
+    """
+    if hair_request.latitude is None:
+        return []
+    return _rank_nearby(hair_request, _nearby(hair_request, radius_km), limit)
+
+
+async def anearby_donors(hair_request, radius_km, limit=None):
+    """nearby_donors() for async views"""
+    if hair_request.latitude is None:
+        return []
+    donors = [donor async for donor in _nearby(hair_request, radius_km)]
+    return _rank_nearby(hair_request, donors, limit)
+
+
+def _proposals(hair_request, limit):
+    return (
+        DonationMatch.objects
+        .filter(request=hair_request, is_proposal=True, donor__status='Available', donor__willing_to_donate=True)
+        .select_related('donor')
+        .order_by('-score')[:limit or candidates_per_request()]
+    )
+
+
+def _proposed_donor(match):
+    match.donor.match_score = match.score
+    return match.donor
+
+
+def proposed_donors(hair_request, limit=None):
+    """Precomputed donor ranking for a request, best first"""
+    return [_proposed_donor(match) for match in _proposals(hair_request, limit)]
+
+
+async def aproposed_donors(hair_request, limit=None):
+    """proposed_donors() for async views"""
+    return [_proposed_donor(match) async for match in _proposals(hair_request, limit)]
@@ -0,0 +1,221 @@
+"""
+Per-view request metrics.
+
+RequestMetricsMiddleware times every request and files it under the URL
+name it resolved to (e.g. 'search', 'admin:index'). SQL is measured by an
+execute wrapper installed on each new connection (hair_app.signals) and
+template rendering by the TimedDjangoTemplates backend; both report to the
+sample of the current request through a context variable, which asgiref
+carries into the threads async views run their queries in.
+
+Samples are aggregated in memory per process: running totals plus a bounded
+window of recent values for percentiles. They are exposed as JSON to staff
+and in Prometheus text format, and optionally as a Server-Timing header.
+"""
+import threading
+import time
+from asyncio import iscoroutinefunction
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.utils.decorators import sync_and_async_middleware
+
+# name -> (Prometheus metric, help text)
+SERIES = {
+    'duration': ('hair_request_duration_seconds', 'Wall time of the request'),
+    'queries': ('hair_request_queries', 'SQL queries run by the request'),
+    'sql': ('hair_request_sql_seconds', 'Time spent in SQL'),
+    'template': ('hair_request_template_seconds', 'Time spent rendering templates'),
+}
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+_current = ContextVar('request_metrics_sample', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Sample:
+    """Measurements of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+
+class ViewStats:
+    """Totals and a window of recent samples for one URL name"""
+
+    def __init__(self, window):
+        self.count = 0
+        self.totals = dict.fromkeys(SERIES, 0.0)
+        self.recent = {name: deque(maxlen=window) for name in SERIES}
+
+    def add(self, sample):
+        self.count += 1
+        for name in SERIES:
+            value = getattr(sample, name)
+            self.totals[name] += value
+            self.recent[name].append(value)
+
+    def quantiles(self, name):
+        values = sorted(self.recent[name])
+        if not values:
+            return {q: 0.0 for q in QUANTILES}
+        # Nearest-rank percentile
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+class Registry:
+    """Thread-safe map of URL name -> ViewStats"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view_name, sample):
+        with self.lock:
+            stats = self.views.get(view_name)
+            if stats is None:
+                stats = self.views[view_name] = ViewStats(_setting('METRICS_WINDOW', 1000))
+            stats.add(sample)
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+    def summary(self):
+        """{view: {'count': n, 'duration': {'mean': .., 'p50': .., ...}, ...}}"""
+        with self.lock:
+            result = {}
+            for view_name, stats in sorted(self.views.items()):
+                entry = {'count': stats.count}
+                for name in SERIES:
+                    entry[name] = {'mean': stats.totals[name] / stats.count}
+                    for q, value in stats.quantiles(name).items():
+                        entry[name][f'p{int(q * 100)}'] = value
+                result[view_name] = entry
+            return result
+
+    def prometheus(self):
+        """All series as Prometheus summaries (text exposition format)"""
+        lines = []
+        with self.lock:
+            for name, (metric, help_text) in SERIES.items():
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} summary')
+                for view_name, stats in sorted(self.views.items()):
+                    label = view_name.replace('\\', '\\\\').replace('"', '\\"')
+                    for q, value in stats.quantiles(name).items():
+                        lines.append(f'{metric}{{view="{label}",quantile="{q}"}} {value}')
+                    lines.append(f'{metric}_sum{{view="{label}"}} {stats.totals[name]}')
+                    lines.append(f'{metric}_count{{view="{label}"}} {stats.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper adding each query to the current request's sample"""
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.sql += time.perf_counter() - start
+
+
+def install(connection):
+    """Measure the queries of a database connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        sample = _current.get()
+        if sample is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            sample.template += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The stock Django template backend, timing each top-level render"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match and match.view_name else 'unresolved'
+
+
+def _server_timing(sample):
+    return ', '.join([
+        f'total;dur={sample.duration * 1000:.1f}',
+        f'db;dur={sample.sql * 1000:.1f};desc="{sample.queries} queries"',
+        f'tpl;dur={sample.template * 1000:.1f}',
+    ])
+
+
+def _finish(request, response, sample, token):
+    _current.reset(token)
+    sample.finish()
+    registry.record(_view_name(request), sample)
+    if response is not None and _setting('METRICS_SERVER_TIMING', False):
+        response['Server-Timing'] = _server_timing(sample)
+
+
+@sync_and_async_middleware
+def RequestMetricsMiddleware(get_response):
+    """Record wall, SQL and template time of each request under its URL name"""
+    if not _setting('METRICS_ENABLED', True):
+        return get_response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            sample = Sample()
+            token = _current.set(sample)
+            response = None
+            try:
+                response = await get_response(request)
+            finally:
+                _finish(request, response, sample, token)
+            return response
+    else:
+        def middleware(request):
+            sample = Sample()
+            token = _current.set(sample)
+            response = None
+            try:
+                response = get_response(request)
+            finally:
+                _finish(request, response, sample, token)
+            return response
+    return middleware
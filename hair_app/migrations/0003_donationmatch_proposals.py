@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0002_userprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donationmatch',
+            name='is_proposal',
+            field=models.BooleanField(default=False, help_text='Suggested by the matching engine, not yet confirmed'),
+        ),
+        migrations.AddField(
+            model_name='donationmatch',
+            name='score',
+            field=models.FloatField(blank=True, help_text='Matching engine score', null=True),
+        ),
+    ]
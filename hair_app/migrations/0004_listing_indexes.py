@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0003_donationmatch_proposals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donationmatch',
+            index=models.Index(condition=models.Q(('is_proposal', True)), fields=['request', '-score'], name='match_request_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationmatch',
+            index=models.Index(fields=['donor', 'is_proposal', '-matched_date'], name='match_donor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationmatch',
+            index=models.Index(fields=['donation_completed'], name='match_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairdonor',
+            index=models.Index(condition=models.Q(('status', 'Available')), fields=['-hair_length', '-id'], name='donor_available_length_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairdonor',
+            index=models.Index(fields=['status', 'hair_length'], name='donor_status_length_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairdonor',
+            index=models.Index(fields=['user', '-created_at'], name='donor_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairrequest',
+            index=models.Index(condition=models.Q(('request_status', 'Fulfilled'), _negated=True), fields=['-urgency', '-created_at', '-id'], name='request_open_urgency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairrequest',
+            index=models.Index(fields=['request_status', 'required_hair_length'], name='request_status_length_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairrequest',
+            index=models.Index(fields=['user', '-urgency', '-created_at'], name='request_user_urgency_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:15
+
+from django.db import migrations, models
+
+URGENCY_PRIORITY = {
+    'Low': 1,
+    'Medium': 2,
+    'High': 3,
+    'Emergency': 4,
+}
+
+
+def backfill_urgency_priority(apps, schema_editor):
+    HairRequest = apps.get_model('hair_app', 'HairRequest')
+    for urgency, priority in URGENCY_PRIORITY.items():
+        HairRequest.objects.filter(urgency=urgency).update(urgency_priority=priority)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0004_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='hairrequest',
+            options={'ordering': ['-urgency_priority', '-created_at']},
+        ),
+        migrations.RemoveIndex(
+            model_name='hairrequest',
+            name='request_open_urgency_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='hairrequest',
+            name='request_user_urgency_idx',
+        ),
+        migrations.AddField(
+            model_name='hairrequest',
+            name='urgency_priority',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Numeric rank of urgency, kept in sync on save'),
+        ),
+        migrations.RunPython(backfill_urgency_priority, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='hairrequest',
+            index=models.Index(condition=models.Q(('request_status', 'Fulfilled'), _negated=True), fields=['-urgency_priority', '-created_at', '-id'], name='request_open_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairrequest',
+            index=models.Index(fields=['user', '-urgency_priority', '-created_at'], name='request_user_priority_idx'),
+        ),
+    ]
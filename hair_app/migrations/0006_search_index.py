@@ -0,0 +1,42 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'hair_app_search'
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "kind, object_id UNINDEXED, title, location, details, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+POPULATE_SQL = [
+    f"INSERT INTO {SEARCH_TABLE} (kind, object_id, title, location, details) "
+    "SELECT 'donor', id, full_name, city || ' ' || state || ' ' || pincode, hair_color || ' ' || hair_type "
+    "FROM hair_app_hairdonor WHERE status = 'Available'",
+    f"INSERT INTO {SEARCH_TABLE} (kind, object_id, title, location, details) "
+    "SELECT 'request', id, patient_name, city || ' ' || state || ' ' || pincode, patient_type || ' ' || hospital_name "
+    "FROM hair_app_hairrequest WHERE request_status != 'Fulfilled'",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    for sql in POPULATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0005_hairrequest_urgency_priority'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donationmatch',
+            index=models.Index(fields=['-matched_date', '-id'], name='match_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0007_donationmatch_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donationmatch',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:23
+
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    HairRequest = apps.get_model('hair_app', 'HairRequest')
+    HairRequest.objects.exclude(medical_certificate='').exclude(medical_certificate__isnull=True).update(
+        certificate_status='Ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0008_donationmatch_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hairrequest',
+            name='certificate_staging',
+            field=models.CharField(blank=True, editable=False, help_text='Staged upload waiting to be processed', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='hairrequest',
+            name='certificate_status',
+            field=models.CharField(blank=True, choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Ready', 'Ready'), ('Failed', 'Failed')], editable=False, help_text='Background processing state of the uploaded certificate', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0010_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='unique_key',
+            field=models.CharField(blank=True, help_text='Deduplicates waiting jobs; cleared once a worker picks the job up', max_length=200, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('kind', models.CharField(choices=[('match', 'Donation match'), ('contact', 'Contact message')], max_length=20)),
+                ('subject', models.CharField(max_length=300)),
+                ('body', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['recipient', 'id'], name='notification_unsent_idx')],
+            },
+        ),
+    ]
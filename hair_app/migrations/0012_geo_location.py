@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:44
+
+from django.db import migrations, models
+
+from hair_app.geo import PREFIX_LENGTH, cell_for, read_centroids
+
+
+def load_centroids(apps, schema_editor):
+    """Load the bundled prefix centroids and locate existing donors and requests"""
+    PincodeCentroid = apps.get_model('hair_app', 'PincodeCentroid')
+    centroids = {pincode: (latitude, longitude) for pincode, latitude, longitude in read_centroids()}
+    PincodeCentroid.objects.bulk_create([
+        PincodeCentroid(pincode=pincode, latitude=latitude, longitude=longitude)
+        for pincode, (latitude, longitude) in centroids.items()
+    ])
+
+    for model_name in ('HairDonor', 'HairRequest'):
+        model = apps.get_model('hair_app', model_name)
+        located = []
+        for obj in model.objects.only('id', 'pincode').iterator(chunk_size=1000):
+            pincode = obj.pincode.replace(' ', '')
+            point = centroids.get(pincode) or centroids.get(pincode[:PREFIX_LENGTH])
+            if point:
+                obj.latitude, obj.longitude = point
+                obj.geo_cell = cell_for(*point)
+                located.append(obj)
+        model.objects.bulk_update(located, ['latitude', 'longitude', 'geo_cell'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0011_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PincodeCentroid',
+            fields=[
+                ('pincode', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+            ],
+            options={
+                'ordering': ['pincode'],
+            },
+        ),
+        migrations.AddField(
+            model_name='hairdonor',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, editable=False, help_text='Grid cell of the centroid, see hair_app.geo', null=True),
+        ),
+        migrations.AddField(
+            model_name='hairdonor',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, help_text='Centroid of the pincode', null=True),
+        ),
+        migrations.AddField(
+            model_name='hairdonor',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, help_text='Centroid of the pincode', null=True),
+        ),
+        migrations.AddField(
+            model_name='hairrequest',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, editable=False, help_text='Grid cell of the centroid, see hair_app.geo', null=True),
+        ),
+        migrations.AddField(
+            model_name='hairrequest',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, help_text='Centroid of the pincode', null=True),
+        ),
+        migrations.AddField(
+            model_name='hairrequest',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, help_text='Centroid of the pincode', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='hairdonor',
+            index=models.Index(fields=['status', 'geo_cell'], name='donor_status_cell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairrequest',
+            index=models.Index(fields=['geo_cell'], name='request_cell_idx'),
+        ),
+        migrations.RunPython(load_centroids, migrations.RunPython.noop),
+    ]
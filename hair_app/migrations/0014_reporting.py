@@ -0,0 +1,102 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0013_matchchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('state', models.CharField(max_length=100)),
+                ('donors', models.PositiveIntegerField(default=0)),
+                ('available', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day', 'state'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MatchDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('wait_seconds', models.BigIntegerField(default=0, help_text='Total time from request to match')),
+                ('rated', models.PositiveIntegerField(default=0)),
+                ('rating_total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RequestDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('patient_type', models.CharField(max_length=50)),
+                ('urgency', models.CharField(max_length=20)),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('matched', models.PositiveIntegerField(default=0, help_text='Since matched with a donor or fulfilled')),
+            ],
+            options={
+                'ordering': ['day', 'patient_type', 'urgency'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StaleReportDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=20)),
+                ('day', models.DateField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='donationmatch',
+            index=models.Index(fields=['updated_at'], name='match_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairdonor',
+            index=models.Index(fields=['updated_at'], name='donor_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairdonor',
+            index=models.Index(fields=['created_at'], name='donor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairrequest',
+            index=models.Index(fields=['updated_at'], name='request_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hairrequest',
+            index=models.Index(fields=['created_at'], name='request_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stalereportday',
+            constraint=models.UniqueConstraint(fields=('source', 'day'), name='stale_report_day_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='requestdailystats',
+            constraint=models.UniqueConstraint(fields=('day', 'patient_type', 'urgency'), name='request_daily_stats_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='donordailystats',
+            constraint=models.UniqueConstraint(fields=('day', 'state'), name='donor_daily_stats_unique'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'hair_app_search'
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "kind, object_id UNINDEXED, title, location, details, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+# rowid = pk * 2 + kind bit, as in hair_app.search.row_id
+POPULATE_SQL = [
+    f"INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, title, location, details) "
+    "SELECT id * 2, 'donor', id, full_name, city || ' ' || state || ' ' || pincode, "
+    "hair_color || ' ' || hair_type "
+    "FROM hair_app_hairdonor WHERE status = 'Available'",
+    f"INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, title, location, details) "
+    "SELECT id * 2 + 1, 'request', id, patient_name, city || ' ' || state || ' ' || pincode, "
+    "patient_type || ' ' || hospital_name "
+    "FROM hair_app_hairrequest WHERE request_status != 'Fulfilled'",
+]
+
+
+def rekey_search_index(apps, schema_editor):
+    """Re-create the index with rows stored under their derived rowid"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+    schema_editor.execute(CREATE_SQL)
+    for sql in POPULATE_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0014_reporting'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_search_index, migrations.RunPython.noop),
+    ]
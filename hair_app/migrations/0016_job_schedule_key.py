@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hair_app', '0015_search_rowids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='schedule_key',
+            field=models.CharField(blank=True, editable=False, help_text='JOB_SCHEDULE task and period this job was queued for', max_length=200, null=True, unique=True),
+        ),
+    ]
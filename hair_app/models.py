@@ -1,6 +1,19 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from . import geo
+
+# Filled in from the pincode on save, see hair_app.geo
+LOCATION_FIELDS = {'latitude', 'longitude', 'geo_cell'}
+
+
+def _location_update_fields(update_fields):
+    """update_fields widened so a changed pincode also saves its location"""
+    if update_fields is not None and 'pincode' in update_fields:
+        return set(update_fields) | LOCATION_FIELDS
+    return update_fields
+
+
 class HairDonor(models.Model):
     GENDER_CHOICES = [
         ('M', 'Male'),
@@ -40,6 +53,10 @@ class HairDonor(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
     pincode = models.CharField(max_length=10)
+    latitude = models.FloatField(null=True, blank=True, editable=False, help_text="Centroid of the pincode")
+    longitude = models.FloatField(null=True, blank=True, editable=False, help_text="Centroid of the pincode")
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False,
+                                   help_text="Grid cell of the centroid, see hair_app.geo")
     
     hair_length = models.FloatField(help_text="Hair length in inches")
     hair_type = models.CharField(max_length=20, choices=HAIR_TYPE_CHOICES)
@@ -56,8 +73,28 @@ class HairDonor(models.Model):
     def __str__(self):
         return f"{self.full_name} - {self.hair_length} inches"
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'pincode' in update_fields:
+            geo.locate_all([self])
+            kwargs['update_fields'] = _location_update_fields(update_fields)
+        super().save(*args, **kwargs)
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # donor_list / search / matching: available donors, longest hair first
+            models.Index(fields=['-hair_length', '-id'], name='donor_available_length_idx',
+                         condition=models.Q(status='Available')),
+            models.Index(fields=['status', 'hair_length'], name='donor_status_length_idx'),
+            # profile / my_donations
+            models.Index(fields=['user', '-created_at'], name='donor_user_created_idx'),
+            # radius filters and nearby matching: donors of a status per grid cell
+            models.Index(fields=['status', 'geo_cell'], name='donor_status_cell_idx'),
+            # reports refresh: rows changed since the watermark, rows created on a day
+            models.Index(fields=['updated_at'], name='donor_updated_idx'),
+            models.Index(fields=['created_at'], name='donor_created_idx'),
+        ]
 
 
 class HairRequest(models.Model):
@@ -76,6 +113,14 @@ class HairRequest(models.Model):
         ('Emergency', 'Emergency'),
     ]
     
+    # Sortable rank of each urgency level, stored in urgency_priority
+    URGENCY_PRIORITY = {
+        'Low': 1,
+        'Medium': 2,
+        'High': 3,
+        'Emergency': 4,
+    }
+    
     REQUEST_STATUS = [
         ('Pending', 'Pending'),
         ('Approved', 'Approved'),
@@ -84,6 +129,13 @@ class HairRequest(models.Model):
         ('Rejected', 'Rejected'),
     ]
     
+    CERTIFICATE_STATUS = [
+        ('Pending', 'Pending'),
+        ('Processing', 'Processing'),
+        ('Ready', 'Ready'),
+        ('Failed', 'Failed'),
+    ]
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     patient_name = models.CharField(max_length=200)
     email = models.EmailField()
@@ -93,10 +145,16 @@ class HairRequest(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
     pincode = models.CharField(max_length=10)
+    latitude = models.FloatField(null=True, blank=True, editable=False, help_text="Centroid of the pincode")
+    longitude = models.FloatField(null=True, blank=True, editable=False, help_text="Centroid of the pincode")
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False,
+                                   help_text="Grid cell of the centroid, see hair_app.geo")
     
     patient_type = models.CharField(max_length=20, choices=PATIENT_TYPE_CHOICES)
     medical_condition = models.TextField(help_text="Brief description of medical condition")
     urgency = models.CharField(max_length=20, choices=URGENCY_CHOICES)
+    urgency_priority = models.PositiveSmallIntegerField(default=0, editable=False,
+                                                        help_text="Numeric rank of urgency, kept in sync on save")
     
     required_hair_length = models.FloatField(help_text="Minimum hair length needed in inches")
     preferred_hair_color = models.CharField(max_length=100, blank=True)
@@ -106,6 +164,10 @@ class HairRequest(models.Model):
     doctor_name = models.CharField(max_length=200, blank=True)
     doctor_contact = models.CharField(max_length=15, blank=True)
     medical_certificate = models.FileField(upload_to='medical_certificates/', null=True, blank=True)
+    certificate_status = models.CharField(max_length=20, choices=CERTIFICATE_STATUS, blank=True, editable=False,
+                                          help_text="Background processing state of the uploaded certificate")
+    certificate_staging = models.CharField(max_length=255, blank=True, editable=False,
+                                           help_text="Staged upload waiting to be processed")
     
     request_status = models.CharField(max_length=20, choices=REQUEST_STATUS, default='Pending')
     matched_donor = models.ForeignKey(HairDonor, on_delete=models.SET_NULL, null=True, blank=True)
@@ -117,8 +179,38 @@ class HairRequest(models.Model):
     def __str__(self):
         return f"{self.patient_name} - {self.patient_type} - {self.urgency}"
     
+    def sync_urgency_priority(self):
+        """Set urgency_priority from urgency; also needed before bulk_create"""
+        self.urgency_priority = self.URGENCY_PRIORITY.get(self.urgency, 0)
+    
+    def save(self, *args, **kwargs):
+        self.sync_urgency_priority()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'pincode' in update_fields:
+            geo.locate_all([self])
+            update_fields = _location_update_fields(update_fields)
+        if update_fields is not None and 'urgency' in update_fields:
+            update_fields = set(update_fields) | {'urgency_priority'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+    
     class Meta:
-        ordering = ['-urgency', '-created_at']
+        ordering = ['-urgency_priority', '-created_at']
+        indexes = [
+            # request_list / search: everything not yet fulfilled, most urgent first
+            models.Index(fields=['-urgency_priority', '-created_at', '-id'], name='request_open_priority_idx',
+                         condition=~models.Q(request_status='Fulfilled')),
+            # home page counter and matching queue
+            models.Index(fields=['request_status', 'required_hair_length'], name='request_status_length_idx'),
+            # profile / my_requests
+            models.Index(fields=['user', '-urgency_priority', '-created_at'], name='request_user_priority_idx'),
+            # radius filters
+            models.Index(fields=['geo_cell'], name='request_cell_idx'),
+            # reports refresh: rows changed since the watermark, rows created on a day
+            models.Index(fields=['updated_at'], name='request_updated_idx'),
+            models.Index(fields=['created_at'], name='request_created_idx'),
+        ]
 
 
 class DonationMatch(models.Model):
@@ -129,12 +221,121 @@ class DonationMatch(models.Model):
     completion_date = models.DateField(null=True, blank=True)
     feedback = models.TextField(blank=True)
     rating = models.IntegerField(null=True, blank=True, help_text="Rating from 1-5")
+    score = models.FloatField(null=True, blank=True, help_text="Matching engine score")
+    is_proposal = models.BooleanField(default=False, help_text="Suggested by the matching engine, not yet confirmed")
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.donor.full_name} -> {self.request.patient_name}"
     
     class Meta:
         ordering = ['-matched_date']
+        indexes = [
+            # request_detail: precomputed ranking for one request
+            models.Index(fields=['request', '-score'], name='match_request_score_idx',
+                         condition=models.Q(is_proposal=True)),
+            # profile / my_donations: confirmed matches of a donor
+            models.Index(fields=['donor', 'is_proposal', '-matched_date'], name='match_donor_date_idx'),
+            # home page counter
+            models.Index(fields=['donation_completed'], name='match_completed_idx'),
+            # admin changelist default ordering
+            models.Index(fields=['-matched_date', '-id'], name='match_date_idx'),
+            # reports refresh: matches changed since the watermark
+            models.Index(fields=['updated_at'], name='match_updated_idx'),
+        ]
+
+
+class MatchChange(models.Model):
+    """A donor or request whose match proposals may be stale, see hair_app.changes"""
+    KIND_CHOICES = [
+        ('donor', 'Donor'),
+        ('request', 'Request'),
+    ]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+    
+    class Meta:
+        ordering = ['id']
+
+
+class DonorDailyStats(models.Model):
+    """Donors registered on a day per state, see hair_app.reports"""
+    day = models.DateField()
+    state = models.CharField(max_length=100)
+    donors = models.PositiveIntegerField(default=0)
+    available = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['day', 'state']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'state'], name='donor_daily_stats_unique'),
+        ]
+
+
+class RequestDailyStats(models.Model):
+    """Requests made on a day per patient type and urgency, see hair_app.reports"""
+    day = models.DateField()
+    patient_type = models.CharField(max_length=50)
+    urgency = models.CharField(max_length=20)
+    requests = models.PositiveIntegerField(default=0)
+    matched = models.PositiveIntegerField(default=0, help_text="Since matched with a donor or fulfilled")
+    
+    class Meta:
+        ordering = ['day', 'patient_type', 'urgency']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'patient_type', 'urgency'], name='request_daily_stats_unique'),
+        ]
+
+
+class MatchDailyStats(models.Model):
+    """Confirmed matches made on a day, see hair_app.reports"""
+    day = models.DateField(unique=True)
+    matches = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    wait_seconds = models.BigIntegerField(default=0, help_text="Total time from request to match")
+    rated = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['day']
+
+
+class StaleReportDay(models.Model):
+    """A day whose rollup lost a deleted row and must be regrouped"""
+    source = models.CharField(max_length=20)
+    day = models.DateField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'day'], name='stale_report_day_unique'),
+        ]
+
+
+class ReportWatermark(models.Model):
+    """How far hair_app.reports.refresh() has read the source tables"""
+    name = models.CharField(max_length=50, primary_key=True)
+    updated_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.name} ({self.updated_at})"
+
+
+class PincodeCentroid(models.Model):
+    """Approximate location of a pincode, or of a 3-digit prefix (sorting district)"""
+    pincode = models.CharField(max_length=10, primary_key=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    
+    def __str__(self):
+        return f"{self.pincode} ({self.latitude}, {self.longitude})"
+    
+    class Meta:
+        ordering = ['pincode']
 
 
 class ContactMessage(models.Model):
@@ -164,4 +365,67 @@ class UserProfile(models.Model):
     date_of_birth = models.DateField(null=True, blank=True)
     
     def __str__(self):
-        return f"{self.user.username}'s Profile"
\ No newline at end of file
+        return f"{self.user.username}'s Profile"
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Running', 'Running'),
+        ('Done', 'Done'),
+        ('Failed', 'Failed'),
+    ]
+    
+    task = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Queued')
+    run_at = models.DateTimeField(help_text="Not picked up before this time")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    unique_key = models.CharField(max_length=200, null=True, blank=True, unique=True,
+                                  help_text="Deduplicates waiting jobs; cleared once a worker picks the job up")
+    schedule_key = models.CharField(max_length=200, null=True, blank=True, unique=True, editable=False,
+                                    help_text="JOB_SCHEDULE task and period this job was queued for")
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # worker polling: due jobs, oldest first
+            models.Index(fields=['run_at', 'id'], name='job_due_idx', condition=models.Q(status='Queued')),
+            # concurrency limits and stale lock recovery
+            models.Index(fields=['task', 'locked_at'], name='job_running_idx', condition=models.Q(status='Running')),
+        ]
+
+
+class Notification(models.Model):
+    KIND_CHOICES = [
+        ('match', 'Donation match'),
+        ('contact', 'Contact message'),
+    ]
+    
+    recipient = models.EmailField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    subject = models.CharField(max_length=300)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    def __str__(self):
+        return f"{self.recipient} - {self.subject}"
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # dispatcher: unsent notifications grouped by recipient
+            models.Index(fields=['recipient', 'id'], name='notification_unsent_idx',
+                         condition=models.Q(sent_at__isnull=True)),
+        ]
@@ -0,0 +1,164 @@
+"""
+Outbound email notifications.
+
+Signals record a Notification row per recipient instead of mailing from the
+request thread, and queue a send_notifications job a few minutes out. When
+it runs, everything waiting for a recipient is folded into one digest and
+up to NOTIFICATION_BATCH_SIZE digests go out over a single mail connection;
+the rest are left for a follow-up run, which keeps the SMTP rate bounded.
+Digests that fail keep their rows unsent so the job's retries pick them up.
+"""
+import logging
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from . import jobs
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryError(Exception):
+    """Some digests could not be sent; their notifications stay queued"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def staff_recipients():
+    """Addresses of active staff plus NOTIFICATION_STAFF_EMAILS"""
+    emails = set(_setting('NOTIFICATION_STAFF_EMAILS', []))
+    emails.update(
+        User.objects.filter(is_staff=True, is_active=True).exclude(email='').values_list('email', flat=True)
+    )
+    return sorted(emails)
+
+
+def schedule_dispatch():
+    """Queue a send run after the digest window; later notifications join it"""
+    jobs.enqueue('send_notifications', delay=_setting('NOTIFICATION_DIGEST_SECONDS', 300),
+                 unique_key='send_notifications')
+
+
+def notify(recipients, kind, subject, body):
+    """Record a notification for each address and schedule sending"""
+    return notify_many([(recipients, kind, subject, body)])
+
+
+def notify_many(messages):
+    """notify() for several (recipients, kind, subject, body) messages with one insert"""
+    rows = [
+        Notification(recipient=email, kind=kind, subject=subject, body=body)
+        for recipients, kind, subject, body in messages
+        for email in dict.fromkeys(recipients) if email
+    ]
+    if not rows:
+        return []
+    notifications = Notification.objects.bulk_create(rows, batch_size=500)
+    schedule_dispatch()
+    return notifications
+
+
+def build_digest(recipient, notifications):
+    """One EmailMessage covering all of a recipient's pending notifications"""
+    if len(notifications) == 1:
+        subject, body = notifications[0].subject, notifications[0].body
+    else:
+        subject = f'{len(notifications)} new notifications from the Hair Donation Portal'
+        body = '\n\n'.join(f'{n.subject}\n{"-" * len(n.subject)}\n{n.body}' for n in notifications)
+    prefix = _setting('EMAIL_SUBJECT_PREFIX', '')
+    return EmailMessage(f'{prefix}{subject}', body, to=[recipient])
+
+
+def pending():
+    """Unsent notifications that have not used up their attempts"""
+    return Notification.objects.filter(
+        sent_at__isnull=True, attempts__lt=_setting('NOTIFICATION_MAX_ATTEMPTS', 5)
+    )
+
+
+def send_pending(batch_size=None):
+    """
+    Send digests for up to `batch_size` recipients over one connection.
+    Returns the number of digests sent; raises DeliveryError if any failed.
+    """
+    batch_size = batch_size or _setting('NOTIFICATION_BATCH_SIZE', 100)
+    recipients = list(
+        pending().order_by('recipient').values_list('recipient', flat=True).distinct()[:batch_size + 1]
+    )
+    more = len(recipients) > batch_size
+    rows = pending().filter(recipient__in=recipients[:batch_size]).order_by('recipient', 'id')
+
+    sent = failed = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        for recipient, group in groupby(rows, key=lambda notification: notification.recipient):
+            group = list(group)
+            ids = [notification.pk for notification in group]
+            try:
+                connection.send_messages([build_digest(recipient, group)])
+            except Exception as exc:
+                logger.warning('Could not send %s notification(s) to %s: %s', len(ids), recipient, exc)
+                Notification.objects.filter(pk__in=ids).update(attempts=F('attempts') + 1, last_error=str(exc))
+                failed += 1
+                continue
+            Notification.objects.filter(pk__in=ids).update(sent_at=timezone.now(), attempts=F('attempts') + 1)
+            sent += 1
+    finally:
+        connection.close()
+
+    if more:
+        # The next batch goes out after a pause rather than in one burst
+        jobs.enqueue('send_notifications', delay=_setting('NOTIFICATION_BATCH_INTERVAL_SECONDS', 60))
+    if failed:
+        raise DeliveryError(f'{failed} digest(s) failed, {sent} sent')
+    return sent
+
+
+def purge(days=None):
+    """Delete sent notifications older than NOTIFICATION_RETENTION_DAYS"""
+    days = _setting('NOTIFICATION_RETENTION_DAYS', 30) if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Notification.objects.filter(sent_at__lt=cutoff).delete()
+    return deleted
+
+
+def _match_messages(match, staff):
+    donor, hair_request = match.donor, match.request
+    subject = f'New donation match: {donor.full_name} -> {hair_request.patient_name}'
+    body = (
+        f'{donor.full_name} ({donor.hair_length} inches, {donor.hair_color}, {donor.city}) has been matched '
+        f'with {hair_request.patient_name} ({hair_request.patient_type}, urgency {hair_request.urgency}, '
+        f'{hair_request.city}).'
+    )
+    return [
+        (staff, 'match', subject, body),
+        ([donor.email], 'match', 'You have been matched with a patient',
+         f'Thank you, {donor.full_name}! Your hair donation has been matched with a patient in '
+         f'{hair_request.city}. Our team will contact you with the next steps.'),
+    ]
+
+
+def match_created(match):
+    """Tell staff and the donor about a confirmed DonationMatch"""
+    notify_many(_match_messages(match, staff_recipients()))
+
+
+def matches_created(matches):
+    """match_created() for many matches, looking up staff and inserting once"""
+    staff = staff_recipients()
+    notify_many(message for match in matches for message in _match_messages(match, staff))
+
+
+def contact_received(message):
+    """Forward a new ContactMessage to staff"""
+    notify(staff_recipients(), 'contact', f'Contact form: {message.subject}',
+           f'From: {message.name} <{message.email}>\n\n{message.message}')
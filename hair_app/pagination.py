@@ -0,0 +1,268 @@
+"""
+Keyset (cursor) pagination for the public listings.
+
+Pages are fetched with a `WHERE (key) < (last key seen)` predicate instead of
+OFFSET, so every page costs the same no matter how deep the visitor goes.
+Totals come from a short-lived cached COUNT rather than one per page view.
+"""
+import base64
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def _page_size_setting():
+    return getattr(settings, 'LISTING_PAGE_SIZE', 24)
+
+
+def _max_page_size_setting():
+    return getattr(settings, 'LISTING_MAX_PAGE_SIZE', 100)
+
+
+class CursorEncoder(json.JSONEncoder):
+    """Like DjangoJSONEncoder but keeps full microsecond precision"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps([direction, values], cls=CursorEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (direction, values) or None for a missing or malformed cursor"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+def _split(ordering):
+    """'-hair_length' -> ('hair_length', True)"""
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+
+
+def _keyset_filter(model, ordering, values):
+    """
+    Q object selecting rows that sort strictly after `values`, or None when
+    they don't fit the ordering (a tampered or stale cursor)
+    """
+    keys = _split(ordering)
+    if len(values) != len(keys):
+        return None
+    try:
+        values = [model._meta.get_field(name).to_python(value) for (name, _), value in zip(keys, values)]
+    except (ValidationError, TypeError, ValueError):
+        return None
+    if any(value is None for value in values):
+        # The ordering fields are not nullable; NULL can't be compared anyway
+        return None
+
+    # (a, b) < (x, y)  ==  a < x OR (a = x AND b < y)
+    condition = Q()
+    for i, (name, descending) in enumerate(keys):
+        lookup = 'lt' if descending else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[i]})
+        for j in range(i):
+            step &= Q(**{keys[j][0]: values[j]})
+        condition |= step
+    return condition
+
+
+def _count_key(queryset):
+    """Cache key for the COUNT of a queryset, or None if it matches nothing"""
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return None
+    return 'count:' + hashlib.md5(sql.encode()).hexdigest()
+
+
+def _count_timeout(timeout):
+    return getattr(settings, 'LISTING_COUNT_CACHE_SECONDS', 60) if timeout is None else timeout
+
+
+def cached_count(queryset, timeout=None):
+    """COUNT(*) for a queryset, cached for a short while by its SQL"""
+    key = _count_key(queryset)
+    if key is None:
+        return 0
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, _count_timeout(timeout))
+    return count
+
+
+async def acached_count(queryset, timeout=None):
+    """cached_count() for async views"""
+    key = _count_key(queryset)
+    if key is None:
+        return 0
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(key, count, _count_timeout(timeout))
+    return count
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing"""
+
+    def __init__(self, object_list, ordering, has_next, has_previous, total_count):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.total_count = total_count
+        self.next_cursor = self._cursor(object_list[-1], FORWARD) if has_next and object_list else None
+        self.previous_cursor = self._cursor(object_list[0], BACKWARD) if has_previous and object_list else None
+        self.next_query = ''
+        self.previous_query = ''
+        self.first_query = ''
+
+    def _cursor(self, obj, direction):
+        return encode_cursor([getattr(obj, name) for name, _ in _split(self.ordering)], direction)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def _page_query(queryset, ordering, cursor, page_size):
+    """(sliced queryset for the page plus one row, direction, cursor values)"""
+    decoded = decode_cursor(cursor)
+    direction, values = decoded if decoded else (FORWARD, None)
+
+    page_ordering = ordering if direction == FORWARD else _reverse(ordering)
+    paged = queryset
+    if values is not None:
+        condition = _keyset_filter(queryset.model, page_ordering, values)
+        if condition is None:
+            # Malformed: serve the first page
+            direction, values, page_ordering = FORWARD, None, ordering
+        else:
+            paged = paged.filter(condition)
+    return paged.order_by(*page_ordering)[:page_size + 1], direction, values
+
+
+def _make_page(rows, ordering, page_size, direction, values, total_count):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if direction == FORWARD:
+        return KeysetPage(rows, ordering, has_more, values is not None, total_count)
+    rows.reverse()
+    return KeysetPage(rows, ordering, True, has_more, total_count)
+
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=None, count=True):
+    """
+    Return a KeysetPage of `queryset` sorted by `ordering`.
+    `ordering` must end with a unique field (normally '-id').
+    """
+    page_size = page_size or _page_size_setting()
+    total_count = cached_count(queryset) if count else None
+    paged, direction, values = _page_query(queryset, ordering, cursor, page_size)
+    return _make_page(list(paged), ordering, page_size, direction, values, total_count)
+
+
+async def akeyset_paginate(queryset, ordering, cursor=None, page_size=None, count=True):
+    """keyset_paginate() for async views"""
+    page_size = page_size or _page_size_setting()
+    total_count = await acached_count(queryset) if count else None
+    paged, direction, values = _page_query(queryset, ordering, cursor, page_size)
+    rows = [row async for row in paged]
+    return _make_page(rows, ordering, page_size, direction, values, total_count)
+
+
+def _request_page_size(request, size_param):
+    try:
+        page_size = int(request.GET.get(size_param) or _page_size_setting())
+    except ValueError:
+        page_size = _page_size_setting()
+    return max(1, min(page_size, _max_page_size_setting()))
+
+
+def paginate_request(request, queryset, ordering, prefix=''):
+    """
+    Paginate `queryset` using the `<prefix>cursor` and `<prefix>page_size`
+    query parameters and attach query strings for the page links.
+    """
+    cursor_param = f'{prefix}cursor'
+    page_size = _request_page_size(request, f'{prefix}page_size')
+    page = keyset_paginate(queryset, ordering, request.GET.get(cursor_param), page_size)
+    return _link_pages(request, page, cursor_param)
+
+
+async def apaginate_request(request, queryset, ordering, prefix=''):
+    """paginate_request() for async views"""
+    cursor_param = f'{prefix}cursor'
+    page_size = _request_page_size(request, f'{prefix}page_size')
+    page = await akeyset_paginate(queryset, ordering, request.GET.get(cursor_param), page_size)
+    return _link_pages(request, page, cursor_param)
+
+
+def _link_pages(request, page, cursor_param):
+    """Attach the query strings of the first, next and previous page links"""
+    params = request.GET.copy()
+    params.pop(cursor_param, None)
+    page.first_query = params.urlencode()
+    if page.next_cursor:
+        params[cursor_param] = page.next_cursor
+        page.next_query = params.urlencode()
+    if page.previous_cursor:
+        params[cursor_param] = page.previous_cursor
+        page.previous_query = params.urlencode()
+    return page
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator for large admin changelists. Unfiltered PostgreSQL tables use
+    the planner's row estimate; everything else uses the cached COUNT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > getattr(settings, 'ADMIN_ESTIMATE_COUNT_ABOVE', 10000):
+                return row[0]
+        return cached_count(queryset)
@@ -0,0 +1,254 @@
+"""
+Daily rollups behind the staff reporting dashboard.
+
+The dashboard only reads the DonorDailyStats, RequestDailyStats and
+MatchDailyStats tables, never the live HairDonor, HairRequest and
+DonationMatch tables. refresh() keeps them current incrementally: it reads
+the days of the rows whose updated_at is past the stored watermark (plus
+the days recorded when counted rows were deleted) and regroups only those
+days. A row is counted on the day it was created or matched, which never
+changes, so regrouping that day also handles rows that changed state or
+dimension since the last refresh.
+"""
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import (DonationMatch, DonorDailyStats, HairDonor, HairRequest, MatchDailyStats, ReportWatermark,
+                     RequestDailyStats, StaleReportDay)
+
+WATERMARK = 'daily'
+
+# Days regrouped per query
+DAY_BATCH = 100
+
+MATCHED_REQUEST_STATUSES = ['Matched', 'Fulfilled']
+
+
+def watermark_lag():
+    """Rows saved in a transaction still open during a refresh are read again by the next one"""
+    return datetime.timedelta(seconds=getattr(settings, 'REPORTS_WATERMARK_LAG_SECONDS', 300))
+
+
+def dashboard_months():
+    return getattr(settings, 'REPORTS_DASHBOARD_MONTHS', 12)
+
+
+def _state_name(value):
+    return ' '.join((value or '').split()).title() or 'Unknown'
+
+
+def _day_filter(field, days):
+    """Q matching `field` on any of `days`, merging consecutive days into one range"""
+    query = Q()
+    days = sorted(days)
+    start = previous = days[0]
+    for day in days[1:] + [None]:
+        if day is not None and day - previous == datetime.timedelta(days=1):
+            previous = day
+            continue
+        query |= Q(**{
+            f'{field}__gte': _start_of(start),
+            f'{field}__lt': _start_of(previous + datetime.timedelta(days=1)),
+        })
+        start = previous = day
+    return query
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _donor_rows(days):
+    totals = defaultdict(lambda: [0, 0])
+    rows = (
+        HairDonor.objects.filter(_day_filter('created_at', days)).order_by()
+        .annotate(day=TruncDate('created_at')).values('day', 'state')
+        .annotate(donors=Count('id'), available=Count('id', filter=Q(status='Available')))
+    )
+    for row in rows:
+        # The state is free text; 'maharashtra ' and 'Maharashtra' are one row
+        counts = totals[row['day'], _state_name(row['state'])]
+        counts[0] += row['donors']
+        counts[1] += row['available']
+    return [
+        DonorDailyStats(day=day, state=state, donors=donors, available=available)
+        for (day, state), (donors, available) in totals.items()
+    ]
+
+
+def _request_rows(days):
+    rows = (
+        HairRequest.objects.filter(_day_filter('created_at', days)).order_by()
+        .annotate(day=TruncDate('created_at')).values('day', 'patient_type', 'urgency')
+        .annotate(requests=Count('id'), matched=Count('id', filter=Q(request_status__in=MATCHED_REQUEST_STATUSES)))
+    )
+    return [RequestDailyStats(**row) for row in rows]
+
+
+def _match_rows(days):
+    totals = {}
+    rows = (
+        DonationMatch.objects.filter(_day_filter('matched_date', days), is_proposal=False)
+        .values_list('matched_date', 'request__created_at', 'donation_completed', 'rating')
+    )
+    for matched_date, requested, completed, rating in rows.iterator(chunk_size=2000):
+        day = timezone.localdate(matched_date)
+        stats = totals.get(day)
+        if stats is None:
+            stats = totals[day] = MatchDailyStats(day=day)
+        stats.matches += 1
+        stats.completed += int(completed)
+        stats.wait_seconds += max(int((matched_date - requested).total_seconds()), 0)
+        if rating is not None:
+            stats.rated += 1
+            stats.rating_total += rating
+    return list(totals.values())
+
+
+# source -> (model, day field, rollup model, row builder)
+SOURCES = {
+    'donors': (HairDonor, 'created_at', DonorDailyStats, _donor_rows),
+    'requests': (HairRequest, 'created_at', RequestDailyStats, _request_rows),
+    'matches': (DonationMatch, 'matched_date', MatchDailyStats, _match_rows),
+}
+
+
+def _source_rows(source):
+    model, _, _, _ = SOURCES[source]
+    if model is DonationMatch:
+        # Proposals churn on every matching run and are not reported
+        return model.objects.filter(is_proposal=False)
+    return model.objects.all()
+
+
+def _days(queryset, field):
+    return set(queryset.order_by().annotate(day=TruncDate(field)).values_list('day', flat=True).distinct())
+
+
+def _regroup(source, days):
+    _, _, rollup, build = SOURCES[source]
+    days = sorted(days)
+    for start in range(0, len(days), DAY_BATCH):
+        batch = days[start:start + DAY_BATCH]
+        rollup.objects.filter(day__in=batch).delete()
+        rollup.objects.bulk_create(build(batch))
+
+
+def refresh(full=False):
+    """
+    Regroup the days changed since the last refresh, or every day if `full`.
+    Returns {source: days regrouped}.
+    """
+    started = timezone.now()
+    with transaction.atomic():
+        watermark = ReportWatermark.objects.select_for_update().filter(name=WATERMARK).first()
+        if watermark is None:
+            full = True
+        regrouped = {}
+        for source, (_, field, rollup, _) in SOURCES.items():
+            queryset = _source_rows(source)
+            if full:
+                rollup.objects.all().delete()
+            else:
+                queryset = queryset.filter(updated_at__gt=watermark.updated_at)
+            days = _days(queryset, field)
+            days.update(StaleReportDay.objects.filter(source=source).values_list('day', flat=True))
+            _regroup(source, days)
+            regrouped[source] = len(days)
+        StaleReportDay.objects.all().delete()
+        ReportWatermark.objects.update_or_create(name=WATERMARK,
+                                                 defaults={'updated_at': started - watermark_lag()})
+    return regrouped
+
+
+def record_delete(instance):
+    """Have the next refresh regroup the day a deleted row was counted on"""
+    for source, (model, field, _, _) in SOURCES.items():
+        if isinstance(instance, model):
+            if getattr(instance, 'is_proposal', False):
+                return
+            day = timezone.localdate(getattr(instance, field))
+            transaction.on_commit(lambda: StaleReportDay.objects.bulk_create(
+                [StaleReportDay(source=source, day=day)], ignore_conflicts=True))
+            return
+
+
+def _month_starts(count, today=None):
+    today = today or timezone.localdate()
+    year, month = today.year, today.month
+    months = []
+    for _ in range(count):
+        months.append(datetime.date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months[::-1]
+
+
+def dashboard(months=None):
+    """Monthly figures for the last `months` months, read from the rollup tables only"""
+    month_list = _month_starts(months or dashboard_months())
+    since = month_list[0]
+    column = {month: position for position, month in enumerate(month_list)}
+
+    by_state = defaultdict(lambda: [0] * len(month_list))
+    donor_rows = (
+        DonorDailyStats.objects.filter(day__gte=since).annotate(month=TruncMonth('day'))
+        .values('month', 'state').annotate(total=Sum('donors')).order_by()
+    )
+    for row in donor_rows:
+        by_state[row['state']][column[row['month']]] += row['total']
+    donors_by_state = sorted(
+        ((state, counts, sum(counts)) for state, counts in by_state.items()),
+        key=lambda item: (-item[2], item[0]),
+    )
+
+    urgencies = [value for value, _ in HairRequest.URGENCY_CHOICES]
+    by_type = {value: [0] * len(urgencies) for value, _ in HairRequest.PATIENT_TYPE_CHOICES}
+    matched_by_type = defaultdict(int)
+    request_rows = (
+        RequestDailyStats.objects.filter(day__gte=since).values('patient_type', 'urgency')
+        .annotate(total=Sum('requests'), matched=Sum('matched')).order_by()
+    )
+    for row in request_rows:
+        counts = by_type.setdefault(row['patient_type'], [0] * len(urgencies))
+        if row['urgency'] in urgencies:
+            counts[urgencies.index(row['urgency'])] += row['total']
+        matched_by_type[row['patient_type']] += row['matched']
+    requests_by_type = [
+        (patient_type, counts, sum(counts), matched_by_type[patient_type])
+        for patient_type, counts in by_type.items()
+    ]
+
+    match_rows = {
+        row['month']: row for row in
+        MatchDailyStats.objects.filter(day__gte=since).annotate(month=TruncMonth('day')).values('month')
+        .annotate(matches=Sum('matches'), completed=Sum('completed'), wait_seconds=Sum('wait_seconds'),
+                  rated=Sum('rated'), rating_total=Sum('rating_total')).order_by()
+    }
+    match_trend = []
+    for month in month_list:
+        row = match_rows.get(month)
+        matches = row['matches'] if row else 0
+        rated = row['rated'] if row else 0
+        match_trend.append({
+            'month': month,
+            'matches': matches,
+            'completed': row['completed'] if row else 0,
+            'days_to_match': round(row['wait_seconds'] / matches / 86400, 1) if matches else None,
+            'average_rating': round(row['rating_total'] / rated, 2) if rated else None,
+        })
+
+    watermark = ReportWatermark.objects.filter(name=WATERMARK).first()
+    return {
+        'months': month_list,
+        'donors_by_state': donors_by_state,
+        'urgencies': urgencies,
+        'requests_by_type': requests_by_type,
+        'match_trend': match_trend,
+        'refreshed_at': watermark.updated_at + watermark_lag() if watermark else None,
+    }
@@ -0,0 +1,301 @@
+"""
+Full-text search over donors and requests.
+
+On SQLite the searchable text lives in an FTS5 virtual table
+(`hair_app_search`) that signals keep in sync with HairDonor and HairRequest.
+Each row is stored under the rowid row_id(kind, pk), the only key FTS5 can
+look up without scanning the table, so updates and deletes stay cheap.
+Only rows that may appear in search results are indexed: available donors
+and requests that are not fulfilled. Other databases fall back to the
+original icontains filters.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import HairDonor, HairRequest
+
+SEARCH_TABLE = 'hair_app_search'
+
+# Column weights for bm25(): kind, object_id, title, location, details
+RANK = f'bm25({SEARCH_TABLE}, 0.0, 0.0, 10.0, 5.0, 1.0)'
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "kind, object_id UNINDEXED, title, location, details, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Low bit of the rowid; donors and requests have separate primary keys
+KIND_BITS = {'donor': 0, 'request': 1}
+
+
+def _donor_document(donor):
+    return (
+        donor.full_name,
+        f'{donor.city} {donor.state} {donor.pincode}',
+        f'{donor.hair_color} {donor.hair_type}',
+    )
+
+
+def _request_document(hair_request):
+    return (
+        hair_request.patient_name,
+        f'{hair_request.city} {hair_request.state} {hair_request.pincode}',
+        f'{hair_request.patient_type} {hair_request.hospital_name}',
+    )
+
+
+SEARCH_KINDS = {
+    'donor': {
+        'model': HairDonor,
+        'document': _donor_document,
+        'eligible': lambda queryset: queryset.filter(status='Available'),
+        'fallback_fields': ['full_name', 'city', 'hair_color'],
+    },
+    'request': {
+        'model': HairRequest,
+        'document': _request_document,
+        'eligible': lambda queryset: queryset.exclude(request_status='Fulfilled'),
+        'fallback_fields': ['patient_name', 'city', 'patient_type'],
+    },
+}
+
+MODEL_KINDS = {options['model']: kind for kind, options in SEARCH_KINDS.items()}
+
+
+def is_enabled():
+    """True when the FTS5 index is available on the default database"""
+    return connection.vendor == 'sqlite'
+
+
+def min_query_length():
+    return getattr(settings, 'SEARCH_MIN_QUERY_LENGTH', 2)
+
+
+def match_expression(kind, query):
+    """
+    FTS5 MATCH expression for a free-text query. Every word must match,
+    and each word also matches as a prefix ("pun" finds "Pune").
+    """
+    terms = TOKEN_RE.findall(query.lower())
+    if not terms:
+        return None
+    words = ' AND '.join(f'"{term}"*' for term in terms)
+    return f'kind:{kind} AND {{title location details}}: ({words})'
+
+
+# ---------------------------------------------------------------------------
+# Index maintenance
+# ---------------------------------------------------------------------------
+
+def row_id(kind, pk):
+    return pk * 2 + KIND_BITS[kind]
+
+
+def _is_indexable(kind, obj):
+    if kind == 'donor':
+        return obj.status == 'Available'
+    return obj.request_status != 'Fulfilled'
+
+
+def remove_object(kind, object_id):
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [row_id(kind, object_id)])
+
+
+def _insert(cursor, kind, objects):
+    document = SEARCH_KINDS[kind]['document']
+    cursor.executemany(
+        f'INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, title, location, details) '
+        'VALUES (%s, %s, %s, %s, %s, %s)',
+        [(row_id(kind, obj.pk), kind, obj.pk, *document(obj)) for obj in objects if _is_indexable(kind, obj)],
+    )
+
+
+def index_objects(kind, objects):
+    """Insert or refresh the index rows of the given model instances"""
+    if not is_enabled():
+        return
+    objects = list(objects)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+            [(row_id(kind, obj.pk),) for obj in objects],
+        )
+        _insert(cursor, kind, objects)
+
+
+def index_object(obj):
+    index_objects(MODEL_KINDS[type(obj)], [obj])
+
+
+def rebuild(batch_size=1000):
+    """
+    Drop and repopulate the whole index in one transaction, so searches see
+    the old index until it commits. Returns the number of rows indexed.
+    """
+    if not is_enabled():
+        return 0
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+        cursor.execute(CREATE_SQL)
+        for kind, options in SEARCH_KINDS.items():
+            queryset = options['eligible'](options['model'].objects.order_by())
+            batch = []
+            for obj in queryset.iterator(chunk_size=batch_size):
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    _insert(cursor, kind, batch)
+                    total += len(batch)
+                    batch = []
+            _insert(cursor, kind, batch)
+            total += len(batch)
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def _fallback_queryset(kind, query, within=None):
+    options = SEARCH_KINDS[kind]
+    condition = Q()
+    for field in options['fallback_fields']:
+        condition |= Q(**{f'{field}__icontains': query})
+    queryset = options['eligible'](options['model'].objects.filter(condition))
+    if within is not None:
+        queryset = queryset.filter(pk__in=within.values('pk'))
+    return queryset
+
+
+def _match_where(expression, within):
+    """WHERE clause and params; `within` limits matches to the rows of a queryset"""
+    where = f'{SEARCH_TABLE} MATCH %s'
+    params = [expression]
+    if within is not None:
+        sql, within_params = within.order_by().values('pk').query.sql_with_params()
+        where += f' AND object_id IN ({sql})'
+        params.extend(within_params)
+    return where, params
+
+
+def ranked_ids(kind, query, limit, offset=0, within=None):
+    """Primary keys of the best matches, best first"""
+    if not is_enabled():
+        queryset = _fallback_queryset(kind, query, within)
+        return list(queryset.values_list('pk', flat=True)[offset:offset + limit])
+
+    expression = match_expression(kind, query)
+    if expression is None or (within is not None and within.query.is_empty()):
+        return []
+    where, params = _match_where(expression, within)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT object_id FROM {SEARCH_TABLE} WHERE {where} ORDER BY {RANK} LIMIT %s OFFSET %s',
+            params + [limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def match_count(kind, query, within=None):
+    if not is_enabled():
+        return _fallback_queryset(kind, query, within).count()
+
+    expression = match_expression(kind, query)
+    if expression is None or (within is not None and within.query.is_empty()):
+        return 0
+    where, params = _match_where(expression, within)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {where}', params)
+        return cursor.fetchone()[0]
+
+
+class SearchPage:
+    """One page of ranked search results, shaped like pagination.KeysetPage"""
+
+    def __init__(self, object_list, number, has_next, total_count):
+        self.object_list = object_list
+        self.number = number
+        self.has_next = has_next
+        self.has_previous = number > 1
+        self.total_count = total_count
+        self.next_query = ''
+        self.previous_query = ''
+        self.first_query = ''
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def _page_params(request, prefix):
+    """(page number, page size) from the `<prefix>page` and `<prefix>page_size` parameters"""
+    default_size = getattr(settings, 'LISTING_PAGE_SIZE', 24)
+    try:
+        number = max(1, int(request.GET.get(f'{prefix}page') or 1))
+        page_size = int(request.GET.get(f'{prefix}page_size') or default_size)
+    except ValueError:
+        number, page_size = 1, default_size
+    return number, max(1, min(page_size, getattr(settings, 'LISTING_MAX_PAGE_SIZE', 100)))
+
+
+def search_page(request, kind, query, prefix='', within=None):
+    """
+    Ranked results for `query` using the `<prefix>page` and
+    `<prefix>page_size` query parameters, optionally limited to the rows of
+    the `within` queryset (e.g. a radius filter).
+    """
+    number, page_size = _page_params(request, prefix)
+    ids = ranked_ids(kind, query, page_size + 1, (number - 1) * page_size, within)
+    objects = SEARCH_KINDS[kind]['model'].objects.in_bulk(ids[:page_size])
+    page = _make_page(ids, objects, number, page_size, match_count(kind, query, within))
+    return _link_pages(request, page, prefix)
+
+
+async def asearch_page(request, kind, query, prefix='', within=None):
+    """search_page() for async views; the FTS5 queries still run in a worker thread"""
+    number, page_size = _page_params(request, prefix)
+    ids = await sync_to_async(ranked_ids)(kind, query, page_size + 1, (number - 1) * page_size, within)
+    objects = await SEARCH_KINDS[kind]['model'].objects.ain_bulk(ids[:page_size])
+    total_count = await sync_to_async(match_count)(kind, query, within)
+    page = _make_page(ids, objects, number, page_size, total_count)
+    return _link_pages(request, page, prefix)
+
+
+def _make_page(ids, objects, number, page_size, total_count):
+    return SearchPage(
+        [objects[pk] for pk in ids[:page_size] if pk in objects],
+        number,
+        len(ids) > page_size,
+        total_count,
+    )
+
+
+def _link_pages(request, page, prefix):
+    """Attach the query strings of the first, next and previous page links"""
+    page_param = f'{prefix}page'
+    number = page.number
+    params = request.GET.copy()
+    params.pop(page_param, None)
+    page.first_query = params.urlencode()
+    if page.has_next:
+        params[page_param] = number + 1
+        page.next_query = params.urlencode()
+    if page.has_previous:
+        params[page_param] = number - 1
+        page.previous_query = params.urlencode()
+    return page
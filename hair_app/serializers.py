@@ -0,0 +1,85 @@
+from rest_framework import serializers
+
+from .models import HairDonor, HairRequest, DonationMatch
+
+
+class SparseFieldsetSerializer(serializers.ModelSerializer):
+    """
+    Drops every field not named in the `?fields=a,b,c` query parameter.
+    The primary key is always kept.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get('request'))
+        if requested is None:
+            return
+        for name in list(self.fields):
+            if name not in requested and name != 'id':
+                self.fields.pop(name)
+
+    @classmethod
+    def model_columns(cls, request):
+        """Model columns needed to render the requested fields, for QuerySet.only()"""
+        requested = requested_fields(request)
+        model_fields = {field.name for field in cls.Meta.model._meta.concrete_fields}
+        columns = {'id', 'updated_at'}
+        extra_kwargs = getattr(cls.Meta, 'extra_kwargs', {})
+        for name in cls.Meta.fields:
+            if extra_kwargs.get(name, {}).get('write_only'):
+                continue
+            if requested is not None and name not in requested:
+                continue
+            if name in model_fields:
+                columns.add(name)
+        return columns
+
+
+def requested_fields(request):
+    if request is None or request.method != 'GET':
+        return None
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class HairDonorSerializer(SparseFieldsetSerializer):
+    class Meta:
+        model = HairDonor
+        fields = [
+            'id', 'full_name', 'email', 'phone', 'age', 'gender', 'address', 'city', 'state', 'pincode',
+            'hair_length', 'hair_type', 'hair_color', 'hair_condition', 'willing_to_donate',
+            'status', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['status', 'created_at', 'updated_at']
+        extra_kwargs = {
+            'phone': {'write_only': True},
+            'address': {'write_only': True},
+        }
+
+
+class HairRequestSerializer(SparseFieldsetSerializer):
+    class Meta:
+        model = HairRequest
+        fields = [
+            'id', 'patient_name', 'email', 'phone', 'age', 'address', 'city', 'state', 'pincode',
+            'patient_type', 'medical_condition', 'urgency', 'required_hair_length',
+            'preferred_hair_color', 'preferred_hair_type', 'hospital_name', 'doctor_name',
+            'doctor_contact', 'certificate_status', 'request_status', 'matched_donor', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['certificate_status', 'request_status', 'matched_donor', 'created_at', 'updated_at']
+        extra_kwargs = {
+            'phone': {'write_only': True},
+            'address': {'write_only': True},
+            'doctor_contact': {'write_only': True},
+        }
+
+
+class DonationMatchSerializer(SparseFieldsetSerializer):
+    class Meta:
+        model = DonationMatch
+        fields = [
+            'id', 'donor', 'request', 'matched_date', 'donation_completed', 'completion_date',
+            'feedback', 'rating', 'updated_at',
+        ]
+        read_only_fields = ['matched_date', 'updated_at']
@@ -0,0 +1,40 @@
+"""
+Session engine: Django's cached_db with a bounded cache lifetime.
+
+Each authenticated page view loads the session. With cached_db that is a
+cache read, and the session table is only queried on a miss; writes
+(login, logout, changed session data) still go to both. With
+CACHE_BACKEND=locmem the 'sessions' cache is per process, so a session
+deleted in one worker (a logout or password change) stays readable from
+the other workers' caches until it expires there. cached_db would cache
+it for the whole session age (two weeks), so this engine caps that at
+SESSION_CACHE_SECONDS.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+def cache_seconds():
+    return getattr(settings, 'SESSION_CACHE_SECONDS', 60)
+
+
+class _BoundedCache:
+    """The session cache with every set() capped at cache_seconds()"""
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def set(self, key, value, timeout, version=None):
+        return self._cache.set(key, value, min(timeout, cache_seconds()), version)
+
+
+class SessionStore(CachedDBStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = _BoundedCache(self._cache)
@@ -1,7 +1,41 @@
-from django.db.models.signals import post_save
+import django
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, HairDonor, HairRequest, DonationMatch, ContactMessage
+from . import caching, changes, metrics, notifications, reports, search, stats
+
+# Model -> hair_app.caching namespace
+CACHE_NAMESPACES = {
+    HairDonor: 'donors',
+    HairRequest: 'requests',
+    DonationMatch: 'matches',
+}
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """WAL lets readers run alongside a writer; busy_timeout makes writers queue instead of failing"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode={getattr(settings, 'SQLITE_JOURNAL_MODE', 'WAL')}")
+        cursor.execute(f"PRAGMA synchronous={getattr(settings, 'SQLITE_SYNCHRONOUS', 'NORMAL')}")
+        cursor.execute(f"PRAGMA busy_timeout={int(getattr(settings, 'SQLITE_BUSY_TIMEOUT_MS', 20000))}")
+    if django.VERSION < (5, 1):
+        # What transaction_mode='IMMEDIATE' does on 5.1+ (see hair_project.database): take the write
+        # lock at BEGIN, so a transaction that reads then writes waits for busy_timeout instead of
+        # failing with "database is locked" when another connection wrote in between
+        connection._start_transaction_under_autocommit = lambda: connection.cursor().execute('BEGIN IMMEDIATE')
+
+
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    """Count and time queries for the request metrics"""
+    if getattr(settings, 'METRICS_ENABLED', True):
+        metrics.install(connection)
 
 
 @receiver(post_save, sender=User)
@@ -12,9 +46,110 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
     """Save profile when user is saved"""
+    if created or update_fields == {'last_login'}:
+        # Just created above, or a login storing last_login: nothing to save
+        return
     if hasattr(instance, 'profile'):
         instance.profile.save()
     else:
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=HairDonor)
+@receiver(post_save, sender=HairRequest)
+def update_search_index(sender, instance, **kwargs):
+    """Keep the full-text search index in sync"""
+    search.index_object(instance)
+
+
+@receiver(post_delete, sender=HairDonor)
+@receiver(post_delete, sender=HairRequest)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Drop deleted rows from the full-text search index"""
+    search.remove_object(search.MODEL_KINDS[sender], instance.pk)
+
+
+@receiver(post_save, sender=HairDonor)
+@receiver(post_save, sender=HairRequest)
+@receiver(post_save, sender=DonationMatch)
+@receiver(post_delete, sender=HairDonor)
+@receiver(post_delete, sender=HairRequest)
+@receiver(post_delete, sender=DonationMatch)
+def bump_cache_version(sender, instance, **kwargs):
+    """Expire cached pages and fragments built from the old data"""
+    if getattr(instance, 'is_proposal', False):
+        # Proposals feed no cached page
+        return
+    caching.bump(CACHE_NAMESPACES[sender])
+
+
+@receiver(post_init, sender=HairDonor)
+@receiver(post_init, sender=HairRequest)
+@receiver(post_init, sender=DonationMatch)
+def remember_stats_state(sender, instance, **kwargs):
+    """Snapshot the counted fields so saves can adjust the home page counters"""
+    stats.remember_state(instance)
+
+
+@receiver(post_save, sender=HairDonor)
+@receiver(post_save, sender=HairRequest)
+@receiver(post_save, sender=DonationMatch)
+def update_stats(sender, instance, created, **kwargs):
+    """Adjust the cached home page counters"""
+    stats.record_save(instance, created)
+
+
+@receiver(post_delete, sender=HairDonor)
+@receiver(post_delete, sender=HairRequest)
+@receiver(post_delete, sender=DonationMatch)
+def update_stats_on_delete(sender, instance, **kwargs):
+    """Adjust the cached home page counters"""
+    if getattr(instance, 'is_proposal', False):
+        return
+    stats.record_delete(instance)
+
+
+@receiver(post_delete, sender=HairDonor)
+@receiver(post_delete, sender=HairRequest)
+@receiver(post_delete, sender=DonationMatch)
+def mark_report_day(sender, instance, **kwargs):
+    """Regroup the reporting rollup a deleted row was counted in"""
+    if getattr(instance, 'is_proposal', False):
+        return
+    reports.record_delete(instance)
+
+
+@receiver(post_init, sender=HairDonor)
+@receiver(post_init, sender=HairRequest)
+def remember_match_state(sender, instance, **kwargs):
+    """Snapshot the fields matching depends on"""
+    changes.remember_state(instance)
+
+
+@receiver(post_save, sender=HairDonor)
+@receiver(post_save, sender=HairRequest)
+def capture_match_change(sender, instance, created, **kwargs):
+    """Queue a rescore of the matches this save may have changed"""
+    changes.record_save(instance, created)
+
+
+@receiver(pre_delete, sender=HairDonor)
+def capture_donor_delete(sender, instance, **kwargs):
+    """Refill the requests that lose a proposed donor"""
+    changes.record_delete(instance)
+
+
+@receiver(post_save, sender=DonationMatch)
+def notify_match(sender, instance, created, **kwargs):
+    """Email staff and the donor about a confirmed match (proposals are not announced)"""
+    if created and not instance.is_proposal:
+        notifications.match_created(instance)
+
+
+@receiver(post_save, sender=ContactMessage)
+def notify_contact(sender, instance, created, **kwargs):
+    """Forward contact form messages to staff"""
+    if created:
+        notifications.contact_received(instance)
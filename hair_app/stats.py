@@ -0,0 +1,127 @@
+"""
+Home page statistics kept in the cache.
+
+Each counter is computed once with COUNT(*) and then adjusted by +1/-1 from
+model signals as rows enter or leave the counted state. Counters expire
+after STATS_RECONCILE_SECONDS so any drift (queryset.update(), raw SQL,
+writes from another process) is corrected by a fresh count.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import HairDonor, HairRequest, DonationMatch
+
+KEY_PREFIX = 'stats:'
+
+# name -> (model, field, value counted)
+COUNTERS = {
+    'total_donors': (HairDonor, 'status', 'Available'),
+    'total_requests': (HairRequest, 'request_status', 'Pending'),
+    'total_matches': (DonationMatch, 'donation_completed', True),
+}
+
+
+def _timeout():
+    return getattr(settings, 'STATS_RECONCILE_SECONDS', 300)
+
+
+def _key(name):
+    return KEY_PREFIX + name
+
+
+def _queryset(name):
+    model, field, value = COUNTERS[name]
+    return model.objects.filter(**{field: value})
+
+
+def counters_for(model):
+    """(name, field, value) of the counters that depend on `model`"""
+    return [(name, field, value) for name, (counter_model, field, value) in COUNTERS.items()
+            if counter_model is model]
+
+
+def get_stats():
+    """All counters, counting only those missing from the cache"""
+    keys = {_key(name): name for name in COUNTERS}
+    cached = cache.get_many(keys)
+    stats = {name: cached.get(key) for key, name in keys.items()}
+    missing = {name: _queryset(name).count() for name, value in stats.items() if value is None}
+    if missing:
+        cache.set_many({_key(name): value for name, value in missing.items()}, _timeout())
+        stats.update(missing)
+    return stats
+
+
+async def aget_stats():
+    """get_stats() for async views"""
+    keys = {_key(name): name for name in COUNTERS}
+    cached = await cache.aget_many(keys)
+    stats = {name: cached.get(key) for key, name in keys.items()}
+    missing = {name: await _queryset(name).acount() for name, value in stats.items() if value is None}
+    if missing:
+        await cache.aset_many({_key(name): value for name, value in missing.items()}, _timeout())
+        stats.update(missing)
+    return stats
+
+
+def _incr(name, delta):
+    try:
+        cache.incr(_key(name), delta)
+    except ValueError:
+        # Not cached; the next read recounts it
+        pass
+
+
+def adjust(name, delta):
+    """Apply a change to a cached counter once the current transaction commits"""
+    if delta:
+        transaction.on_commit(lambda: _incr(name, delta))
+
+
+def invalidate():
+    """Drop every counter so the next read recounts, e.g. after bulk_create"""
+    cache.delete_many([_key(name) for name in COUNTERS])
+
+
+def reconcile():
+    """Recount every counter and return the corrected values"""
+    stats = {name: _queryset(name).count() for name in COUNTERS}
+    cache.set_many({_key(name): value for name, value in stats.items()}, _timeout())
+    return stats
+
+
+def remember_state(instance):
+    """
+    Record which counters an instance currently contributes to. Instances
+    loaded with the counted field deferred are skipped rather than
+    triggering a query per row.
+    """
+    state = {}
+    for name, field, value in counters_for(type(instance)):
+        if field not in instance.__dict__:
+            instance._stats_state = None
+            return
+        state[name] = instance.__dict__[field] == value
+    instance._stats_state = state
+
+
+def record_save(instance, created):
+    previous = {} if created else getattr(instance, '_stats_state', None)
+    if previous is None:
+        # Old state is unknown, so let the next read recount
+        for name, _, _ in counters_for(type(instance)):
+            cache.delete(_key(name))
+    else:
+        for name, field, value in counters_for(type(instance)):
+            adjust(name, int(getattr(instance, field) == value) - int(previous.get(name, False)))
+    remember_state(instance)
+
+
+def record_delete(instance):
+    previous = getattr(instance, '_stats_state', None)
+    for name, _, _ in counters_for(type(instance)):
+        if previous is None:
+            cache.delete(_key(name))
+        elif previous.get(name):
+            adjust(name, -1)
@@ -0,0 +1,203 @@
+"""
+Synthetic donors, requests, matches and users for load testing.
+
+Values follow rough real-world shapes rather than uniform noise: most
+donors are in a handful of large cities, hair length is normally
+distributed around a foot, black and brown hair dominate, and only a
+minority of requests are urgent. Rows are written with bulk_create in
+batches, then the search index, home page counters and page cache
+versions are refreshed since bulk inserts skip the model signals; pincode
+locations are filled in before each batch for the same reason.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, geo, search, stats
+from .models import HairDonor, HairRequest, DonationMatch, UserProfile
+
+# (city, state, pincode prefix, weight)
+CITIES = [
+    ('Mumbai', 'Maharashtra', '400', 18),
+    ('Delhi', 'Delhi', '110', 16),
+    ('Bengaluru', 'Karnataka', '560', 12),
+    ('Hyderabad', 'Telangana', '500', 9),
+    ('Chennai', 'Tamil Nadu', '600', 9),
+    ('Kolkata', 'West Bengal', '700', 8),
+    ('Pune', 'Maharashtra', '411', 7),
+    ('Ahmedabad', 'Gujarat', '380', 6),
+    ('Jaipur', 'Rajasthan', '302', 4),
+    ('Lucknow', 'Uttar Pradesh', '226', 4),
+    ('Kochi', 'Kerala', '682', 3),
+    ('Nagpur', 'Maharashtra', '440', 2),
+    ('Indore', 'Madhya Pradesh', '452', 2),
+]
+
+FIRST_NAMES = ['Aarav', 'Diya', 'Ishaan', 'Ananya', 'Kabir', 'Meera', 'Rohan', 'Saanvi', 'Arjun', 'Priya',
+               'Vihaan', 'Aditi', 'Reyansh', 'Kavya', 'Aryan', 'Nisha', 'Sai', 'Pooja', 'Dev', 'Riya']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Reddy', 'Nair', 'Gupta', 'Das', 'Khan', 'Singh', 'Menon',
+              'Joshi', 'Mehta', 'Rao', 'Verma', 'Bose']
+
+HAIR_COLOR_WEIGHTS = {'Black': 60, 'Brown': 25, 'Blonde': 4, 'Red': 2, 'Grey': 6, 'Other': 3}
+HAIR_TYPE_WEIGHTS = {'Straight': 45, 'Wavy': 30, 'Curly': 18, 'Coily': 7}
+DONOR_STATUS_WEIGHTS = {'Available': 70, 'Pending': 10, 'Donated': 20}
+GENDER_WEIGHTS = {'F': 70, 'M': 25, 'O': 5}
+PATIENT_TYPE_WEIGHTS = {'Cancer': 50, 'Alopecia': 20, 'Burn': 10, 'Medical': 15, 'Other': 5}
+URGENCY_WEIGHTS = {'Low': 25, 'Medium': 40, 'High': 25, 'Emergency': 10}
+REQUEST_STATUS_WEIGHTS = {'Pending': 45, 'Approved': 20, 'Matched': 15, 'Fulfilled': 15, 'Rejected': 5}
+CONDITIONS = ['Natural, never dyed', 'Dyed once, two years ago', 'Henna treated', 'Natural with some split ends']
+
+# Registrations are spread over this many days
+HISTORY_DAYS = 3 * 365
+
+
+class Generator:
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.now = timezone.now()
+
+    def choice(self, weights):
+        return self.random.choices(list(weights), weights=list(weights.values()))[0]
+
+    def place(self):
+        city, state, prefix, _ = self.random.choices(CITIES, weights=[c[3] for c in CITIES])[0]
+        return city, state, f'{prefix}{self.random.randint(1, 99):03d}'
+
+    def name(self):
+        return f'{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}'
+
+    def phone(self):
+        return f'9{self.random.randint(100000000, 999999999)}'
+
+    def created_at(self):
+        # Skewed towards recent registrations
+        age = HISTORY_DAYS * self.random.random() ** 2
+        return self.now - timedelta(days=age)
+
+    def email(self, name, index):
+        return f"{name.lower().replace(' ', '.')}.{index}@example.com"
+
+    def donor(self, index, user_id=None):
+        name = self.name()
+        city, state, pincode = self.place()
+        return HairDonor(
+            user_id=user_id, full_name=name, email=self.email(name, index), phone=self.phone(),
+            age=self.random.randint(16, 60), gender=self.choice(GENDER_WEIGHTS), address=f'{index} Main Road',
+            city=city, state=state, pincode=pincode,
+            hair_length=round(min(30.0, max(6.0, self.random.gauss(12, 4))), 1),
+            hair_type=self.choice(HAIR_TYPE_WEIGHTS), hair_color=self.choice(HAIR_COLOR_WEIGHTS),
+            hair_condition=self.random.choice(CONDITIONS), status=self.choice(DONOR_STATUS_WEIGHTS),
+        )
+
+    def request(self, index, user_id=None):
+        name = self.name()
+        city, state, pincode = self.place()
+        hair_request = HairRequest(
+            user_id=user_id, patient_name=name, email=self.email(name, index), phone=self.phone(),
+            age=self.random.randint(4, 75), address=f'{index} Hospital Road', city=city, state=state,
+            pincode=pincode, patient_type=self.choice(PATIENT_TYPE_WEIGHTS),
+            medical_condition='Undergoing treatment', urgency=self.choice(URGENCY_WEIGHTS),
+            required_hair_length=self.random.choice([8, 10, 10, 12, 12, 14, 16]),
+            preferred_hair_color=self.choice(HAIR_COLOR_WEIGHTS) if self.random.random() < 0.4 else '',
+            preferred_hair_type=self.choice(HAIR_TYPE_WEIGHTS) if self.random.random() < 0.3 else '',
+            request_status=self.choice(REQUEST_STATUS_WEIGHTS),
+        )
+        hair_request.sync_urgency_priority()
+        return hair_request
+
+
+# Share of a total row count that goes to each table
+ROW_SHARES = {'donors': 0.4, 'requests': 0.3, 'matches': 0.2, 'users': 0.1}
+
+
+def counts_for(rows):
+    """Split a total row count across the tables, e.g. for --rows 10000"""
+    return {name: int(rows * share) for name, share in ROW_SHARES.items()}
+
+
+def _batched(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _backdate(model, count, generator, batch_size):
+    """Spread created_at over the history window (auto_now_add ignores explicit values)"""
+    ids = list(model.objects.order_by('-id').values_list('id', flat=True)[:count])
+    for batch in _batched(ids, batch_size):
+        rows = [model(id=pk, created_at=generator.created_at()) for pk in batch]
+        model.objects.bulk_update(rows, ['created_at'], batch_size=batch_size)
+
+
+def generate(donors=0, requests=0, matches=0, users=0, seed=0, batch_size=2000, on_progress=None):
+    """
+    Add synthetic rows to the database and return how many of each were
+    created. About half of the donors and requests belong to the new users.
+    """
+    generator = Generator(seed)
+    progress = on_progress or (lambda *args: None)
+    created = {'users': 0, 'donors': 0, 'requests': 0, 'matches': 0}
+
+    # Hashing is deliberately slow, so every synthetic user shares one password
+    password = make_password('synthetic-password')
+    start = User.objects.filter(username__startswith='synthetic').count()
+    user_ids = []
+    for batch in _batched(range(start, start + users), batch_size):
+        with transaction.atomic():
+            new_users = User.objects.bulk_create([
+                User(username=f'synthetic{i}', email=f'synthetic{i}@example.com', password=password)
+                for i in batch
+            ])
+            UserProfile.objects.bulk_create([UserProfile(user=user) for user in new_users])
+        user_ids.extend(user.pk for user in new_users)
+        created['users'] += len(new_users)
+        progress('users', created['users'])
+
+    def owner():
+        return generator.random.choice(user_ids) if user_ids and generator.random.random() < 0.5 else None
+
+    start = HairDonor.objects.count()
+    for batch in _batched(range(start, start + donors), batch_size):
+        HairDonor.objects.bulk_create(geo.locate_all(generator.donor(i, owner()) for i in batch))
+        created['donors'] += len(batch)
+        progress('donors', created['donors'])
+    _backdate(HairDonor, donors, generator, batch_size)
+
+    start = HairRequest.objects.count()
+    for batch in _batched(range(start, start + requests), batch_size):
+        HairRequest.objects.bulk_create(geo.locate_all(generator.request(i, owner()) for i in batch))
+        created['requests'] += len(batch)
+        progress('requests', created['requests'])
+    _backdate(HairRequest, requests, generator, batch_size)
+
+    if matches:
+        donor_ids = list(HairDonor.objects.values_list('id', flat=True))
+        request_ids = list(HairRequest.objects.values_list('id', flat=True))
+        if donor_ids and request_ids:
+            for batch in _batched(range(matches), batch_size):
+                DonationMatch.objects.bulk_create([
+                    DonationMatch(
+                        donor_id=generator.random.choice(donor_ids),
+                        request_id=generator.random.choice(request_ids),
+                        donation_completed=generator.random.random() < 0.6,
+                        rating=generator.random.choice([None, 3, 4, 5, 5]),
+                    )
+                    for _ in batch
+                ])
+                created['matches'] += len(batch)
+                progress('matches', created['matches'])
+
+    search.rebuild()
+    stats.invalidate()
+    for name in caching.NAMESPACES:
+        caching.bump(name)
+    return created
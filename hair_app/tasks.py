@@ -0,0 +1,63 @@
+"""
+Background tasks run by the job worker (see jobs.py).
+
+Views queue these instead of doing the work inline; the periodic ones are
+listed in settings.JOB_SCHEDULE.
+"""
+from importlib import import_module
+
+from django.conf import settings
+
+from . import jobs, matching, notifications, reports, stats, thumbnails, uploads
+
+
+@jobs.task(concurrency=getattr(settings, 'CERTIFICATE_WORKERS', 2))
+def process_certificate(pk):
+    uploads.process_certificate(pk)
+
+
+# One task for full and incremental runs, so concurrency=1 keeps them from overlapping
+@jobs.task(concurrency=1)
+def compute_matches(changed_only=False):
+    if changed_only:
+        matching.refresh_changed()
+    else:
+        matching.run_matching()
+
+
+@jobs.task(concurrency=1)
+def reconcile_stats():
+    stats.reconcile()
+
+
+@jobs.task(concurrency=1)
+def refresh_reports():
+    reports.refresh()
+
+
+@jobs.task(concurrency=1)
+def prune_thumbnails():
+    thumbnails.evict()
+
+
+@jobs.task(concurrency=1, max_attempts=5, retry_delay=60)
+def send_notifications():
+    notifications.send_pending()
+
+
+@jobs.task(concurrency=1, max_attempts=1)
+def purge_jobs():
+    jobs.purge()
+    notifications.purge()
+
+
+@jobs.task(concurrency=1, max_attempts=1)
+def purge_sessions():
+    # What `manage.py clearsessions` does, on the job schedule
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+
+
+def schedule_matching():
+    """Recompute all match proposals soon; a burst of calls triggers one run"""
+    jobs.enqueue('compute_matches', delay=getattr(settings, 'MATCH_RECOMPUTE_DELAY_SECONDS', 60),
+                 unique_key='compute_matches')
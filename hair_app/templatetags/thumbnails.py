@@ -0,0 +1,15 @@
+from django import template
+
+from hair_app import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(field_file, size='avatar'):
+    """
+    URL of a small variant of an image field, or '' when there is none:
+
+        {% thumbnail_url user.profile.profile_picture 'avatar' as avatar %}
+    """
+    return thumbnails.get_thumbnail(field_file, size) or ''
@@ -0,0 +1,205 @@
+"""
+Small derived images of profile pictures and certificates.
+
+Templates ask for a named size (see SIZES) instead of the original upload.
+The first request reads the source, hashes its content and writes a WebP
+(or JPEG) variant under THUMBNAIL_ROOT named after that hash, so identical
+uploads share one file and a changed source never reuses a stale one. The
+source name -> variant mapping is kept in the cache so later renders only
+touch the variant's mtime, which is what the LRU eviction orders by once
+the directory grows past THUMBNAIL_MAX_BYTES.
+"""
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'thumb:'
+
+# name -> (width, height, crop to fill the box rather than fit inside it)
+SIZES = {
+    'avatar': (120, 120, True),
+    'admin': (160, 160, False),
+    'preview': (480, 480, False),
+}
+
+_lock = threading.Lock()
+# Bytes under THUMBNAIL_ROOT as seen by this process; None until first scanned
+_total_bytes = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def thumbnail_root():
+    return str(_setting('THUMBNAIL_ROOT', os.path.join(settings.MEDIA_ROOT, 'thumbnails')))
+
+
+def thumbnail_url():
+    return _setting('THUMBNAIL_URL', settings.MEDIA_URL + 'thumbnails/')
+
+
+def output_format():
+    """'WEBP' where Pillow was built with it, otherwise 'JPEG'"""
+    wanted = _setting('THUMBNAIL_FORMAT', 'WEBP').upper()
+    if wanted == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return wanted
+
+
+def _key(name, size, image_format):
+    digest = hashlib.sha1(name.encode()).hexdigest()
+    return f'{KEY_PREFIX}{size}:{image_format}:{digest}'
+
+
+def _content_hash(field_file):
+    digest = hashlib.sha1()
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        for chunk in iter(lambda: source.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _variant_name(content_hash, size, image_format):
+    width, height, crop = SIZES[size]
+    extension = 'webp' if image_format == 'WEBP' else 'jpg'
+    mode = 'c' if crop else 'f'
+    return f'{content_hash[:2]}/{content_hash}-{width}x{height}{mode}.{extension}'
+
+
+def _flatten(image):
+    if image.mode in ('RGB', 'L'):
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _render(field_file, size, image_format):
+    width, height, crop = SIZES[size]
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        with Image.open(source) as image:
+            image.draft('RGB', (width * 2, height * 2))
+            image = ImageOps.exif_transpose(image)
+            if crop:
+                image = ImageOps.fit(image, (width, height))
+            else:
+                image.thumbnail((width, height))
+            buffer = BytesIO()
+            _flatten(image).save(buffer, image_format, quality=_setting('THUMBNAIL_QUALITY', 80))
+    return buffer.getvalue()
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so concurrent renders never see half a file
+    temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temporary, 'wb') as output:
+        output.write(data)
+    os.replace(temporary, path)
+
+
+def _scan(root):
+    """(mtime, size, path) of every variant under `root`"""
+    entries = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def evict(max_bytes=None):
+    """
+    Remove least recently used variants until the directory is back under
+    THUMBNAIL_MAX_BYTES (or `max_bytes`); returns the number removed.
+    """
+    global _total_bytes
+    if max_bytes is None:
+        max_bytes = _setting('THUMBNAIL_MAX_BYTES', 256 * 1024 * 1024)
+    entries = sorted(_scan(thumbnail_root()))
+    total = sum(size for _, size, _ in entries)
+    # Leave some headroom so the next few writes don't evict again
+    target = max_bytes * 0.9 if total > max_bytes else total
+    removed = 0
+    for _, size, path in entries:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    _total_bytes = total
+    return removed
+
+
+def _account(size):
+    global _total_bytes
+    with _lock:
+        if _total_bytes is None:
+            _total_bytes = sum(entry[1] for entry in _scan(thumbnail_root()))
+        else:
+            _total_bytes += size
+        over = _total_bytes > _setting('THUMBNAIL_MAX_BYTES', 256 * 1024 * 1024)
+    if over:
+        evict()
+
+
+def get_thumbnail(field_file, size='avatar'):
+    """
+    URL of the `size` variant of an image FileField value, generating it
+    if needed. Returns None when there is no file or it isn't an image
+    (e.g. a PDF certificate), so templates can fall back to a plain link.
+    """
+    if not field_file or size not in SIZES:
+        return None
+    image_format = output_format()
+    key = _key(field_file.name, size, image_format)
+    variant = cache.get(key)
+    if variant == '':
+        # Known not to be an image
+        return None
+    if variant:
+        try:
+            # Mark as recently used for eviction
+            os.utime(os.path.join(thumbnail_root(), variant))
+            return thumbnail_url() + variant
+        except OSError:
+            # Evicted since; render it again
+            pass
+
+    timeout = _setting('THUMBNAIL_CACHE_SECONDS', 24 * 60 * 60)
+    try:
+        variant = _variant_name(_content_hash(field_file), size, image_format)
+        path = os.path.join(thumbnail_root(), variant)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            data = _render(field_file, size, image_format)
+            _write(path, data)
+            _account(len(data))
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        cache.set(key, '', timeout)
+        return None
+    except OSError as exc:
+        logger.warning('Could not make a %s thumbnail of %s: %s', size, field_file.name, exc)
+        return None
+
+    cache.set(key, variant, timeout)
+    return thumbnail_url() + variant
@@ -0,0 +1,154 @@
+"""
+Background processing of medical certificate uploads.
+
+The request form only saves the upload under CERTIFICATE_STAGING_PREFIX in
+the default storage (which the web and worker processes share), marks the
+request 'Pending' and queues a process_certificate job. The job worker then
+checks the file, shrinks and recompresses photos, and stores the result
+under medical_certificates/, moving certificate_status to 'Ready' or
+'Failed'. A retried job takes over a certificate left 'Processing' by a
+worker that died. Uploads staged before a job could be queued are picked up
+again by `manage.py process_certificates`.
+"""
+import logging
+import os
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import jobs
+from .models import HairRequest
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TO = 'medical_certificates/'
+IMAGE_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP'}
+PDF_MAGIC = b'%PDF-'
+
+class CertificateError(Exception):
+    """The staged file is not an acceptable certificate"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def staging_prefix():
+    return _setting('CERTIFICATE_STAGING_PREFIX', 'certificate_staging/')
+
+
+def stage_upload(upload):
+    """
+    Save an UploadedFile under the staging prefix and return its storage
+    name. FileSystemStorage moves uploads Django already spooled to disk and
+    writes smaller ones out chunk by chunk.
+    """
+    name = get_valid_filename(os.path.basename(upload.name)) or 'certificate'
+    return default_storage.save(f'{staging_prefix()}{uuid.uuid4().hex}-{name}', upload)
+
+
+def stage_certificate(hair_request, upload):
+    """Stage `upload` for an unsaved or saved request; call enqueue() after saving"""
+    hair_request.medical_certificate = None
+    hair_request.certificate_staging = stage_upload(upload)
+    hair_request.certificate_status = 'Pending'
+
+
+def enqueue(pk):
+    """Queue processing of the request's staged certificate in the same transaction"""
+    jobs.enqueue('process_certificate', pk, unique_key=f'certificate:{pk}')
+
+
+def _original_name(path):
+    return os.path.basename(path).split('-', 1)[-1]
+
+
+def _flatten(image):
+    if image.mode in ('RGB', 'L'):
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _recompress(staged):
+    max_dimension = _setting('CERTIFICATE_MAX_DIMENSION', 2000)
+    try:
+        with Image.open(staged) as image:
+            if image.format not in IMAGE_FORMATS:
+                raise CertificateError(f'Unsupported image format: {image.format}')
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_dimension, max_dimension))
+            buffer = BytesIO()
+            _flatten(image).save(buffer, 'JPEG', optimize=True, progressive=True,
+                                 quality=_setting('CERTIFICATE_JPEG_QUALITY', 85))
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise CertificateError(f'Not a readable image or PDF: {exc}')
+    return ContentFile(buffer.getvalue())
+
+
+def store_certificate(staged_name):
+    """Validate the staged file `staged_name`, store it and return the storage name"""
+    if default_storage.size(staged_name) > _setting('CERTIFICATE_MAX_BYTES', 15 * 1024 * 1024):
+        raise CertificateError('File is too large')
+    stem = os.path.splitext(_original_name(staged_name))[0] or 'certificate'
+
+    with default_storage.open(staged_name, 'rb') as staged:
+        if staged.read(len(PDF_MAGIC)) == PDF_MAGIC:
+            staged.seek(0)
+            return default_storage.save(f'{UPLOAD_TO}{stem}.pdf', File(staged))
+        staged.seek(0)
+        return default_storage.save(f'{UPLOAD_TO}{stem}.jpg', _recompress(staged))
+
+
+def _discard(staged_name):
+    try:
+        default_storage.delete(staged_name)
+    except OSError:
+        pass
+
+
+def _claim(pk):
+    """
+    Mark the certificate 'Processing' for this worker. A 'Processing' one
+    is taken over once it has been locked longer than a job may run, which
+    is when release_stale() requeues the job of a worker that died.
+    """
+    now = timezone.now()
+    abandoned = Q(certificate_status='Processing', updated_at__lt=now - jobs.lock_timeout())
+    return HairRequest.objects.filter(Q(certificate_status='Pending') | abandoned, pk=pk).update(
+        certificate_status='Processing', updated_at=now)
+
+
+def process_certificate(pk):
+    """Process one request's staged certificate; returns the new certificate_status or None"""
+    if not _claim(pk):
+        # Deleted, or another worker got there first
+        return None
+    staged_name = HairRequest.objects.values_list('certificate_staging', flat=True).get(pk=pk)
+    try:
+        name = store_certificate(staged_name)
+    except (CertificateError, OSError) as exc:
+        logger.warning('Rejected the certificate of request %s: %s', pk, exc)
+        HairRequest.objects.filter(pk=pk).update(certificate_status='Failed', certificate_staging='',
+                                                 updated_at=timezone.now())
+        _discard(staged_name)
+        return 'Failed'
+    except Exception:
+        # Hand it back so the job's retry can claim it again
+        HairRequest.objects.filter(pk=pk).update(certificate_status='Pending')
+        raise
+
+    HairRequest.objects.filter(pk=pk).update(medical_certificate=name, certificate_status='Ready',
+                                             certificate_staging='', updated_at=timezone.now())
+    _discard(staged_name)
+    return 'Ready'
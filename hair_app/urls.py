@@ -27,4 +27,14 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
     path('search/', views.search, name='search'),
+    
+    # Staff exports
+    path('export/<str:kind>.csv', views.export_records, name='export_records'),
+    
+    # Staff reporting
+    path('reports/', views.reports_dashboard, name='reports_dashboard'),
+    
+    # Request metrics
+    path('metrics/', views.metrics_summary, name='metrics_summary'),
+    path('metrics/prometheus', views.metrics_prometheus, name='metrics_prometheus'),
 ]
\ No newline at end of file
@@ -1,24 +1,48 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, authenticate, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Q, Count
-from .models import HairDonor, HairRequest, DonationMatch, ContactMessage, UserProfile
+from .models import HairDonor, HairRequest, DonationMatch
+from .matching import anearby_donors, aproposed_donors
+from .exports import EXPORTS, aexport_lines, export_lines
+from .filters import filter_donors, filter_requests
+from .pagination import apaginate_request
+from . import geo, metrics, reports, search as search_index, stats, uploads
+from .caching import cache_public_page
 from .forms import (UserRegistrationForm, HairDonorForm, HairRequestForm, ContactForm,
                     UserUpdateForm, ProfileUpdateForm, CustomPasswordChangeForm)
 
-def home(request):
+# Listing orderings; the trailing id makes every key unique for keyset pagination
+DONOR_LIST_ORDERING = ['-hair_length', '-id']
+REQUEST_LIST_ORDERING = ['-urgency_priority', '-created_at', '-id']
+
+# Columns the profile and donation history templates actually display
+PROFILE_DONOR_FIELDS = ['full_name', 'status', 'hair_length', 'hair_color', 'hair_type', 'created_at']
+PROFILE_REQUEST_FIELDS = ['patient_name', 'patient_type', 'urgency', 'request_status',
+                          'required_hair_length', 'created_at']
+DONATION_MATCH_FIELDS = ['matched_date', 'donation_completed', 'request__patient_name',
+                         'request__city', 'request__patient_type', 'request__request_status']
+
+
+async def arender(request, template_name, context=None):
+    """
+    render() for the async views. Templates still read request.user and the
+    session, which are sync-only on Django 4.2, so rendering runs in a thread.
+    """
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@cache_public_page('donors', 'requests', 'matches')
+async def home(request):
     """Home page with statistics"""
-    total_donors = HairDonor.objects.filter(status='Available').count()
-    total_requests = HairRequest.objects.filter(request_status='Pending').count()
-    total_matches = DonationMatch.objects.filter(donation_completed=True).count()
-    
-    context = {
-        'total_donors': total_donors,
-        'total_requests': total_requests,
-        'total_matches': total_matches,
-    }
-    return render(request, 'hair_app/home.html', context)
+    context = await stats.aget_stats()
+    return await arender(request, 'hair_app/home.html', context)
 
 
 def register(request):
@@ -73,27 +97,20 @@ def donor_registration(request):
     return render(request, 'hair_app/donor/donor_registration.html', {'form': form})
 
 
-def donor_list(request):
+@cache_public_page('donors')
+async def donor_list(request):
     """List of available hair donors"""
-    donors = HairDonor.objects.filter(status='Available').order_by('-hair_length')
-    
-    # Filter functionality
-    city = request.GET.get('city')
-    hair_color = request.GET.get('hair_color')
-    min_length = request.GET.get('min_length')
+    # The radius filter looks up the pincode's centroid
+    donors = await sync_to_async(filter_donors)(HairDonor.objects.filter(status='Available'), request.GET)
     
-    if city:
-        donors = donors.filter(city__icontains=city)
-    if hair_color:
-        donors = donors.filter(hair_color=hair_color)
-    if min_length:
-        donors = donors.filter(hair_length__gte=min_length)
+    page = await apaginate_request(request, donors, DONOR_LIST_ORDERING)
     
     context = {
-        'donors': donors,
+        'donors': page.object_list,
+        'page': page,
         'hair_colors': HairDonor.HAIR_COLOR_CHOICES,
     }
-    return render(request, 'hair_app/donor/donor_list.html', context)
+    return await arender(request, 'hair_app/donor/donor_list.html', context)
 
 
 def request_hair(request):
@@ -104,7 +121,13 @@ def request_hair(request):
             hair_request = form.save(commit=False)
             if request.user.is_authenticated:
                 hair_request.user = request.user
+            # The certificate is checked and stored by the job worker (see uploads.py)
+            certificate = form.cleaned_data.get('medical_certificate')
+            if certificate:
+                uploads.stage_certificate(hair_request, certificate)
             hair_request.save()
+            if certificate:
+                uploads.enqueue(hair_request.pk)
             messages.success(request, 'Your hair request has been submitted successfully. We will contact you soon.')
             return redirect('request_list')
     else:
@@ -112,66 +135,66 @@ def request_hair(request):
     return render(request, 'hair_app/request/request_hair.html', {'form': form})
 
 
-def request_list(request):
+@cache_public_page('requests')
+async def request_list(request):
     """List of hair requests"""
-    requests = HairRequest.objects.exclude(request_status='Fulfilled').order_by('-urgency', '-created_at')
-    
-    # Filter functionality
-    patient_type = request.GET.get('patient_type')
-    urgency = request.GET.get('urgency')
-    city = request.GET.get('city')
+    requests = await sync_to_async(filter_requests)(HairRequest.objects.exclude(request_status='Fulfilled'),
+                                                    request.GET)
     
-    if patient_type:
-        requests = requests.filter(patient_type=patient_type)
-    if urgency:
-        requests = requests.filter(urgency=urgency)
-    if city:
-        requests = requests.filter(city__icontains=city)
+    page = await apaginate_request(request, requests, REQUEST_LIST_ORDERING)
     
     context = {
-        'requests': requests,
+        'requests': page.object_list,
+        'page': page,
         'patient_types': HairRequest.PATIENT_TYPE_CHOICES,
         'urgency_levels': HairRequest.URGENCY_CHOICES,
     }
-    return render(request, 'hair_app/request/request_list.html', context)
+    return await arender(request, 'hair_app/request/request_list.html', context)
 
 
-def request_detail(request, pk):
+async def request_detail(request, pk):
     """Detail view of a hair request"""
-    hair_request = get_object_or_404(HairRequest, pk=pk)
+    try:
+        hair_request = await HairRequest.objects.aget(pk=pk)
+    except HairRequest.DoesNotExist:
+        raise Http404('No hair request matches the given query.')
     
-    # Find matching donors
-    matching_donors = HairDonor.objects.filter(
-        status='Available',
-        hair_length__gte=hair_request.required_hair_length
-    )
-    
-    if hair_request.preferred_hair_color:
-        matching_donors = matching_donors.filter(hair_color__icontains=hair_request.preferred_hair_color)
+    radius = geo.parse_radius(request.GET.get('radius'))
+    if radius is not None:
+        # Donors near the request, scored on the fly
+        matching_donors = await anearby_donors(hair_request, radius)
+    else:
+        # Ranking is precomputed by the matching engine (manage.py compute_matches)
+        matching_donors = await aproposed_donors(hair_request)
     
     context = {
         'request': hair_request,
-        'matching_donors': matching_donors[:5],
+        'matching_donors': matching_donors,
+        'radius': radius,
     }
-    return render(request, 'hair_app/request/request_detail.html', context)
+    return await arender(request, 'hair_app/request/request_detail.html', context)
 
 
 @login_required
 def user_profile(request):
     """User profile page"""
     # Get user's donor registrations
-    donor_records = HairDonor.objects.filter(user=request.user)
+    donor_records = list(
+        HairDonor.objects.filter(user=request.user).only(*PROFILE_DONOR_FIELDS)
+    )
     
     # Get user's requests
-    user_requests = HairRequest.objects.filter(user=request.user)
+    user_requests = list(
+        HairRequest.objects.filter(user=request.user).only(*PROFILE_REQUEST_FIELDS)
+    )
     
-    # Get donation matches
-    donation_matches = DonationMatch.objects.filter(donor__user=request.user)
+    # Only the number of donation matches is shown
+    donation_match_count = DonationMatch.objects.filter(donor__user=request.user, is_proposal=False).count()
     
     context = {
         'donor_records': donor_records,
         'user_requests': user_requests,
-        'donation_matches': donation_matches,
+        'donation_match_count': donation_match_count,
     }
     return render(request, 'hair_app/pages/profile.html', context)
 
@@ -238,8 +261,13 @@ def delete_account(request):
 @login_required
 def my_donations(request):
     """User's donation history"""
-    my_donor_records = HairDonor.objects.filter(user=request.user)
-    my_donation_matches = DonationMatch.objects.filter(donor__user=request.user)
+    my_donor_records = list(HairDonor.objects.filter(user=request.user))
+    my_donation_matches = list(
+        DonationMatch.objects
+        .filter(donor__user=request.user, is_proposal=False)
+        .select_related('request')
+        .only(*DONATION_MATCH_FIELDS)
+    )
     
     context = {
         'donor_records': my_donor_records,
@@ -259,6 +287,7 @@ def my_requests(request):
     return render(request, 'hair_app/request/my_requests.html', context)
 
 
+@cache_public_page()
 def about(request):
     """About page"""
     return render(request, 'hair_app/pages/about.html')
@@ -277,25 +306,62 @@ def contact(request):
     return render(request, 'hair_app/pages/contact.html', {'form': form})
 
 
-def search(request):
+async def search(request):
     """Search functionality"""
-    query = request.GET.get('q', '')
+    query = request.GET.get('q', '').strip()
+    searched = len(query) >= search_index.min_query_length()
     
-    donors = HairDonor.objects.filter(
-        Q(full_name__icontains=query) | 
-        Q(city__icontains=query) |
-        Q(hair_color__icontains=query)
-    ).filter(status='Available')
-    
-    requests = HairRequest.objects.filter(
-        Q(patient_name__icontains=query) |
-        Q(city__icontains=query) |
-        Q(patient_type__icontains=query)
-    ).exclude(request_status='Fulfilled')
+    donor_page = request_page = None
+    if searched:
+        donors_near = requests_near = None
+        if geo.has_near_filter(request.GET):
+            donors_near = await sync_to_async(geo.filter_near)(HairDonor.objects.all(), request.GET)
+            requests_near = await sync_to_async(geo.filter_near)(HairRequest.objects.all(), request.GET)
+        donor_page = await search_index.asearch_page(request, 'donor', query, prefix='donor_', within=donors_near)
+        request_page = await search_index.asearch_page(request, 'request', query, prefix='request_',
+                                                       within=requests_near)
     
     context = {
         'query': query,
-        'donors': donors,
-        'requests': requests,
+        'searched': searched,
+        'min_query_length': search_index.min_query_length(),
+        'donors': donor_page.object_list if donor_page else [],
+        'requests': request_page.object_list if request_page else [],
+        'donor_page': donor_page,
+        'request_page': request_page,
     }
-    return render(request, 'hair_app/pages/search.html', context)
\ No newline at end of file
+    return await arender(request, 'hair_app/pages/search.html', context)
+
+
+@staff_member_required
+def export_records(request, kind):
+    """Streaming CSV export of donors, requests or matches for staff"""
+    if kind not in EXPORTS:
+        raise Http404('Unknown export')
+    # A sync iterator would be read into memory before an ASGI response starts
+    lines = aexport_lines(kind, request.GET) if isinstance(request, ASGIRequest) else export_lines(kind, request.GET)
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{kind}.csv"'
+    return response
+
+
+@staff_member_required
+def reports_dashboard(request):
+    """Monthly trends for staff, read from the reporting rollups only"""
+    return render(request, 'hair_app/pages/reports.html', reports.dashboard())
+
+
+@staff_member_required
+def metrics_summary(request):
+    """Per-view latency, query and render time percentiles of this process"""
+    return JsonResponse(metrics.registry.summary())
+
+
+def metrics_prometheus(request):
+    """The same metrics in Prometheus text format, for staff or a METRICS_TOKEN bearer"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    allowed = (token and constant_time_compare(authorization, f'Bearer {token}')) or request.user.is_staff
+    if not allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.registry.prometheus(), content_type='text/plain; version=0.0.4')